@@ -1,9 +1,50 @@
 import streamlit as st
-import google.generativeai as genai
-import json
+import hmac
+import math
 import os
+import time
+import uuid
 from datetime import datetime
-import re
+from itertools import islice
+
+from preferences import (
+    CUISINE_OPTIONS,
+    DIETARY_OPTIONS,
+    DIFFICULTY_OPTIONS,
+    MEAL_OPTIONS,
+    MODEL_OPTIONS,
+    QUICK_ADD_CATEGORIES,
+    TIME_OPTIONS,
+    canonical_request,
+    clean_label,
+)
+from ingredients import IngredientSet
+from pantry_import import iter_pantry_items
+from prompts import DEFAULT_INPUT_BUDGET
+from client_pool import ClientRegistry
+from fallback_policy import FallbackPolicy
+from gateway import GenerationGateway
+from jobs import JobManager
+from metrics import Metrics
+from recipe_service import RecipeService, compile_request
+from recipe_cache import CACHE_DIR, RecipeCache
+from recipe_index import LIBRARY_DIR, RecipeIndex
+from recipe_history import RecipeHistory
+from semantic_cache import DEFAULT_THRESHOLD, SemanticCache
+from session_memory import SessionStore
+from recipe_model import recipe_key, recipes_from_markdown, recipes_to_markdown
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# Library recipes must cover this share of their ingredients to be served instead of generating
+LIBRARY_MIN_SCORE = 0.75
+# Ingredients per page of the pantry grid
+INGREDIENT_PAGE_SIZE = 25
+# Recipes per page of the history panel
+HISTORY_PAGE_SIZE = 10
+# API keys whose clients and services stay built at once (sessions may bring their own key)
+MAX_API_KEYS = 8
+# Ingredients one session's pantry may hold; tunable in secrets as MAX_PANTRY_ITEMS
+MAX_PANTRY_ITEMS = 1000
 
 # Configure page
 st.set_page_config(
@@ -13,151 +54,121 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Enhanced Custom CSS
-st.markdown("""
-<style>
-    /* Import Google Fonts */
-    @import url('https://fonts.googleapis.com/css2?family=Poppins:wght@300;400;500;600;700&display=swap');
-    
-    /* Global Styles */
-    * {
-        font-family: 'Poppins', sans-serif;
-    }
-    
-    /* Main Title */
-    .main-header {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        padding: 2rem;
-        border-radius: 15px;
-        text-align: center;
-        margin-bottom: 2rem;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.2);
-    }
-    
-    /* Ingredient Tags */
-    .ingredient-tag {
-        background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
-        color: white;
-        border-radius: 25px;
-        padding: 8px 20px;
-        margin: 5px;
-        display: inline-block;
-        font-size: 14px;
-        font-weight: 500;
-        box-shadow: 0 4px 15px rgba(245, 87, 108, 0.3);
-        transition: all 0.3s ease;
-    }
-    
-    .ingredient-tag:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(245, 87, 108, 0.4);
-    }
-    
-    /* Recipe Cards */
-    .recipe-card {
-        background: #000000;
-        color: white;
-        border-radius: 20px;
-        padding: 30px;
-        margin: 20px 0;
-        box-shadow: 0 10px 30px rgba(0,0,0,0.3);
-        border: 1px solid #333333;
-        transition: all 0.3s ease;
-    }
-    
-    .recipe-card:hover {
-        transform: translateY(-5px);
-        box-shadow: 0 15px 40px rgba(0,0,0,0.4);
-        border: 1px solid #555555;
-    }
-    
-    /* Recipe Title */
-    .recipe-title {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-size: 28px;
-        font-weight: 700;
-        margin-bottom: 15px;
-    }
-    
-    /* Recipe Generation Section */
-    .recipe-generation-section {
-        background: #000000;
-        color: white;
-        padding: 20px;
-        border-radius: 15px;
-        border: 1px solid #333333;
-    }
-    
-    .recipe-generation-section h2 {
-        color: white;
-        margin: 0 0 20px 0;
-    }
-    
-    .recipe-generation-section p, .recipe-generation-section label {
-        color: #e0e0e0 !important;
-    }
-    
-    /* Buttons */
-    .stButton > button {
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        color: white;
-        border: none;
-        padding: 10px 25px;
-        border-radius: 25px;
-        font-weight: 600;
-        transition: all 0.3s ease;
-        box-shadow: 0 4px 15px rgba(102, 126, 234, 0.3);
-    }
-    
-    .stButton > button:hover {
-        transform: translateY(-2px);
-        box-shadow: 0 6px 20px rgba(102, 126, 234, 0.4);
-    }
-    
-    /* Primary Button Override */
-    .stButton > button[kind="primary"] {
-        background: linear-gradient(135deg, #f093fb 0%, #f5576c 100%);
-        box-shadow: 0 4px 15px rgba(245, 87, 108, 0.3);
-    }
-    
-    /* Stats Cards */
-    .stat-card {
-        background: white;
-        border-radius: 15px;
-        padding: 20px;
-        text-align: center;
-        box-shadow: 0 5px 20px rgba(0,0,0,0.08);
-        border: 1px solid #e0e0e0;
-        transition: all 0.3s ease;
-    }
-    
-    .stat-card:hover {
-        transform: translateY(-3px);
-        box-shadow: 0 8px 25px rgba(0,0,0,0.12);
-    }
-    
-    .stat-number {
-        font-size: 32px;
-        font-weight: 700;
-        background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-</style>
-""", unsafe_allow_html=True)
+# One-time, process-wide resources. Streamlit reruns this script on every
+# interaction, so anything expensive to build lives behind st.cache_resource.
+@st.cache_resource
+def load_css():
+    with open(os.path.join(APP_DIR, "static", "style.css"), encoding="utf-8") as f:
+        return f"<style>\n{f.read()}</style>"
+
+@st.cache_resource
+def get_metrics():
+    # Process-wide latency/token metrics; METRICS_PORT also serves them for Prometheus scraping
+    metrics = Metrics(
+        log_path=os.path.join(CACHE_DIR, "generations.jsonl"),
+        prom_path=os.path.join(CACHE_DIR, "metrics.prom"),
+    )
+    if os.environ.get("METRICS_PORT"):
+        metrics.serve(int(os.environ["METRICS_PORT"]))
+    return metrics
+
+@st.cache_resource(max_entries=MAX_API_KEYS)
+def get_client_registry(api_key):
+    # Model clients bound to this key (never the process-wide genai.configure); sessions borrow them from here.
+    # The SDK itself is imported on first use, so startup and pantry edits never wait for it
+    return ClientRegistry(None, api_key, metrics=get_metrics())
+
+@st.cache_resource(max_entries=MAX_API_KEYS)
+def prewarm_clients(api_key):
+    # SDK import and channel setup on a background thread, once per key
+    return get_client_registry(api_key).warm_up(list(MODEL_OPTIONS.values()))
+
+@st.cache_resource
+def get_recipe_cache():
+    # One on-disk cache shared by every session in this process
+    return RecipeCache()
+
+@st.cache_resource
+def get_semantic_cache():
+    # Similarity threshold for reusing a near-duplicate request's recipes; tunable in secrets
+    threshold = float(st.secrets.get("SEMANTIC_CACHE_THRESHOLD", DEFAULT_THRESHOLD))
+    return SemanticCache(threshold=threshold)
+
+@st.cache_resource
+def get_recipe_index():
+    # Local retrieval over cached responses and saved recipe files, shared by every session
+    index = RecipeIndex()
+    index.add_cache(get_recipe_cache())
+    index.add_library()
+    return index
+
+@st.cache_resource
+def get_recipe_history():
+    # Every generation ever made, searchable; outlives the response cache's TTL and eviction
+    return RecipeHistory()
+
+@st.cache_resource
+def get_fallback_policy():
+    # Circuit breakers and latency history are shared by every session
+    return FallbackPolicy(log_path=os.path.join(CACHE_DIR, "outcomes.jsonl"), metrics=get_metrics())
+
+@st.cache_resource
+def get_job_manager():
+    # Generation runs here, off the script thread, so reruns don't lose in-flight results
+    return JobManager()
+
+@st.cache_resource
+def get_session_store():
+    # Recipes and refinement chats of every session, capped per session and offloaded while idle.
+    # Tunable in secrets: [SESSION_MEMORY] max_bytes = 262144, idle_seconds = 900, ttl_seconds = 21600
+    store = SessionStore(metrics=get_metrics(), **st.secrets.get("SESSION_MEMORY", {}))
+    store.start_reaper()
+    return store
+
+@st.cache_resource
+def get_gateway():
+    # Rate limits apply to the API key, so every session goes through one gateway.
+    # Paid tiers can raise them in secrets: [GEMINI_RATE_LIMITS."gemini-1.5-pro"] rpm = 360, tpm = 4000000
+    limits = st.secrets.get("GEMINI_RATE_LIMITS", {})
+    return GenerationGateway(limits={model: dict(values) for model, values in limits.items()})
+
+@st.cache_resource(max_entries=MAX_API_KEYS)
+def get_recipe_service(api_key):
+    # Caches, fallback policy and gateway wired together; batch.py builds the same service headless
+    return RecipeService(
+        get_client_registry(api_key), get_gateway(), get_fallback_policy(), get_recipe_cache(),
+        semantic_cache=get_semantic_cache(), library=get_recipe_index(), metrics=get_metrics(),
+        history=get_recipe_history(),
+    )
+
+def session_workspace():
+    # Looked up on every use: the reaper may have offloaded it since the last full run
+    return get_session_store().get(st.session_state.session_id)
+
+def prompt_budget():
+    # Input-token budget per prompt; long ingredient lists are grouped or trimmed to fit
+    return int(st.secrets.get("PROMPT_TOKEN_BUDGET", DEFAULT_INPUT_BUDGET))
+
+# Enhanced Custom CSS (read from static/style.css once per process)
+st.markdown(load_css(), unsafe_allow_html=True)
 
 # Initialize session state
-if "ingredients_list" not in st.session_state:
-    st.session_state.ingredients_list = []
-if "recipes" not in st.session_state:
-    st.session_state.recipes = []
+if "ingredients" not in st.session_state:
+    # The pantry lives in session state for the life of the tab, so it is capped
+    st.session_state.ingredients = IngredientSet(max_items=int(st.secrets.get("MAX_PANTRY_ITEMS", MAX_PANTRY_ITEMS)))
+if "session_id" not in st.session_state:
+    # Recipes and refinement chats live in the session store under this id
+    st.session_state.session_id = uuid.uuid4().hex
 if "api_configured" not in st.session_state:
     st.session_state.api_configured = False
 if "recipe_count" not in st.session_state:
     st.session_state.recipe_count = 0
+if "job_id" not in st.session_state:
+    # Background generation in progress for this session, if any
+    st.session_state.job_id = None
+if "flash" not in st.session_state:
+    # Messages that must survive the st.rerun() which refreshes the other panels
+    st.session_state.flash = []
 
 # Animated Header
 st.markdown("""
@@ -179,7 +190,7 @@ if not api_key:
             <p>To use this app, you need a Google Gemini API key.</p>
         </div>
         """, unsafe_allow_html=True)
-        
+
         with st.expander("📖 How to get your API key", expanded=True):
             st.markdown("""
             1. Visit [Google AI Studio](https://makersuite.google.com/app/apikey) 🔗
@@ -188,147 +199,248 @@ if not api_key:
             4. Copy your API key
             5. Add it to Streamlit secrets or paste below
             """)
-        
+
         manual_key = st.text_input("🔑 Enter your API key here:", type="password", placeholder="AIza...")
         if manual_key:
             api_key = manual_key
         else:
             st.stop()
 
-# Configure Gemini with error handling
-try:
-    genai.configure(api_key=api_key)
-    st.session_state.api_configured = True
-except Exception as e:
-    st.error(f"❌ Error configuring API: {str(e)}")
-    st.stop()
+# Shared model clients for this key; the SDK itself is loaded after the first paint (end of script)
+get_client_registry(api_key)
+st.session_state.api_configured = True
 
-# Sidebar with gradient
-with st.sidebar:
+
+@st.fragment
+def render_sidebar():
     st.markdown("""
     <div style="text-align: center; padding: 20px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; border-radius: 15px; margin-bottom: 20px;">
         <h2 style="margin: 0;">🎯 Recipe Preferences</h2>
     </div>
     """, unsafe_allow_html=True)
-    
+
     # Model selection with custom styling
-    model_options = {
-        "⚡ Gemini 1.5 Flash (Fast)": "gemini-1.5-flash",
-        "💎 Gemini 1.5 Pro (Advanced)": "gemini-1.5-pro"
-    }
-    
-    selected_model_name = st.selectbox(
+    st.selectbox(
         "🤖 AI Model",
-        list(model_options.keys()),
-        index=0
+        list(MODEL_OPTIONS.keys()),
+        index=0,
+        key="model_label"
     )
-    
-    selected_model = model_options[selected_model_name]
-    
+
     # Preferences with icons
     st.markdown("### ⏱️ Cooking Time")
-    time_pref = st.select_slider(
+    st.select_slider(
         "",
-        options=["⚡ Under 15 min", "🏃 15-30 min", "🚶 30-45 min", "🪑 45-60 min", "🛋️ Over 1 hour"],
+        options=TIME_OPTIONS,
         value="🚶 30-45 min",
-        label_visibility="collapsed"
+        label_visibility="collapsed",
+        key="time_pref"
     )
-    
+
     st.markdown("### 📊 Difficulty Level")
-    difficulty = st.radio(
+    st.radio(
         "",
-        ["👶 Easy", "👦 Medium", "👨 Hard", "🤷 Any"],
+        DIFFICULTY_OPTIONS,
         index=0,
-        label_visibility="collapsed"
+        label_visibility="collapsed",
+        key="difficulty"
     )
-    
+
     st.markdown("### 🥗 Dietary Restrictions")
-    dietary = st.multiselect(
+    st.multiselect(
         "",
-        ["🌱 Vegetarian", "🌿 Vegan", "🌾 Gluten-Free", "🥛 Dairy-Free", 
-         "🥜 Nut-Free", "🥖 Low-Carb", "🥑 Keto"],
+        DIETARY_OPTIONS,
         default=[],
-        label_visibility="collapsed"
+        label_visibility="collapsed",
+        key="dietary"
     )
-    
+
     st.markdown("### 🌍 Cuisine Type")
-    cuisine = st.selectbox(
+    st.selectbox(
         "",
-        ["🌐 Any", "🇮🇹 Italian", "🥢 Asian", "🌮 Mexican", "🇮🇳 Indian", 
-         "🇬🇷 Mediterranean", "🇺🇸 American", "🇫🇷 French"],
-        label_visibility="collapsed"
+        CUISINE_OPTIONS,
+        label_visibility="collapsed",
+        key="cuisine"
     )
-    
+
     st.markdown("### 🍽️ Meal Type")
-    meal_type = st.selectbox(
+    st.selectbox(
         "",
-        ["🍴 Any", "🌅 Breakfast", "☀️ Lunch", "🌙 Dinner", "🍿 Snack", "🍰 Dessert"],
-        label_visibility="collapsed"
+        MEAL_OPTIONS,
+        label_visibility="collapsed",
+        key="meal_type"
     )
 
-# Main content area with better layout
-# Stats row
-if st.session_state.ingredients_list:
-    col1, col2, col3 = st.columns(3)
-    with col1:
-        st.markdown(f"""
-        <div class="stat-card">
-            <div class="stat-number">{len(st.session_state.ingredients_list)}</div>
-            <div style="color: #6b7280; font-weight: 600;">Ingredients</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col2:
-        st.markdown(f"""
-        <div class="stat-card">
-            <div class="stat-number">{st.session_state.recipe_count}</div>
-            <div style="color: #6b7280; font-weight: 600;">Recipes Generated</div>
-        </div>
-        """, unsafe_allow_html=True)
-    
-    with col3:
-        st.markdown(f"""
-        <div class="stat-card">
-            <div class="stat-number">{"✨"}</div>
-            <div style="color: #6b7280; font-weight: 600;">Ready to Cook</div>
-        </div>
-        """, unsafe_allow_html=True)
+    st.markdown("### ⚡ Output")
+    st.toggle("Stream recipes as they are written", value=True, key="stream_output")
+    st.toggle("Check my recipe library first", value=True, key="library_first",
+              help="Serve saved recipes that your pantry covers instead of calling the model")
+    st.toggle("Reuse recipes from my history", value=False, key="reuse_history",
+              help="Answer a pantry generated before (within 30 days) with the recipes it got then")
+    st.toggle("Always generate fresh recipes", value=False, key="fresh_recipes",
+              help="Skip the cache, history and library and ask the model every time")
 
-st.markdown("<br>", unsafe_allow_html=True)
+    with st.expander("📚 Recipe Library"):
+        library = get_recipe_index()
+        st.caption(f"{len(library)} recipes indexed from past generations and saved files")
+        saved_files = st.file_uploader(
+            "Add recipes saved with 💾 Save Recipes:",
+            type=["txt", "md"],
+            accept_multiple_files=True,
+            key="library_files",
+        )
+        if saved_files and st.button("Add to Library", key="add_library", use_container_width=True):
+            os.makedirs(LIBRARY_DIR, exist_ok=True)
+            added = 0
+            for saved in saved_files:
+                # Keep the file so the library survives restarts
+                with open(os.path.join(LIBRARY_DIR, os.path.basename(saved.name)), "wb") as f:
+                    f.write(saved.getvalue())
+                added += library.add(recipes_from_markdown(saved.getvalue().decode("utf-8", errors="replace")))
+            st.success(f"✅ Added {added} recipes to your library!")
 
-# Main content columns
-col1, col2 = st.columns([3, 2])
+    # Response cache counters
+    cache_stats = get_recipe_cache().stats()
+    st.caption(
+        f"🗄️ Cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['entries']} saved"
+    )
+    semantic_stats = get_semantic_cache().stats()
+    st.caption(
+        f"🧠 Similar requests: {semantic_stats['hits']} hits ({semantic_stats['hit_rate']:.0%}) · "
+        f"~{semantic_stats['saved_seconds']:.0f}s of generation saved"
+    )
+    gateway_stats = get_gateway().stats()
+    st.caption(
+        f"🚦 Gateway: {gateway_stats['queue_depth']} queued · {gateway_stats['in_flight']} in flight · "
+        f"{gateway_stats['coalesced']} coalesced"
+    )
 
-with col1:
+    # Operators turn this on with SHOW_ADMIN_PANEL in secrets, or open ?admin=<ADMIN_TOKEN from secrets>
+    if st.secrets.get("SHOW_ADMIN_PANEL", False) or admin_token_given():
+        render_admin_panel()
+
+
+def latency_table(rows, label):
+    """Markdown table of ``Metrics.percentiles`` output, in milliseconds."""
+    def ms(value):
+        return "–" if value is None else f"{value * 1000:,.1f}"
+
+    lines = [f"| {label} | n | p50 ms | p95 ms | p99 ms |", "|---|---:|---:|---:|---:|"]
+    for group, stats in rows.items():
+        lines.append(f"| {group or 'all'} | {stats['count']} | {ms(stats['p50'])} | {ms(stats['p95'])} | {ms(stats['p99'])} |")
+    return "\n".join(lines)
+
+
+def admin_token_given():
+    # No ADMIN_TOKEN in secrets means the panel can't be opened from the URL at all
+    token = st.secrets.get("ADMIN_TOKEN", "")
+    given = st.query_params.get("admin", "")
+    return bool(token) and hmac.compare_digest(given.encode("utf-8"), str(token).encode("utf-8"))
+
+def render_admin_panel():
+    metrics = get_metrics()
+    with st.expander("🛠️ Admin: latency & tokens"):
+        for title, name, label in (
+            ("Time to first token", "recipe_first_token_seconds", "Model"),
+            ("Total generation", "recipe_generation_seconds", "Model"),
+            ("Generate click to result", "recipe_request_seconds", "Source"),
+        ):
+            rows = metrics.percentiles(name, label=label.lower())
+            st.markdown(f"**{title}**")
+            st.markdown(latency_table(rows, label) if rows else "_no samples yet_")
+
+        stages = {
+            "prompt build": metrics.percentiles("recipe_prompt_build_seconds", label=None).get(""),
+            "SDK import": metrics.percentiles("recipe_sdk_import_seconds", label=None).get(""),
+            "model construction": metrics.percentiles("recipe_model_construct_seconds", label=None).get(""),
+            "recipe render": metrics.percentiles("recipe_render_seconds", label=None).get(""),
+        }
+        st.markdown("**Stages**")
+        st.markdown(latency_table({k: v for k, v in stages.items() if v}, "Stage"))
+
+        st.markdown("**Model clients**")
+        health_lines = ["| Model | State | Calls | Failures | Warm-up ms |", "|---|---|---:|---:|---:|"]
+        for model_name, health in get_client_registry(api_key).health().items():
+            warm = "–" if health["warm_seconds"] is None else f"{health['warm_seconds'] * 1000:,.0f}"
+            health_lines.append(
+                f"| {model_name} | {health['state']} | {health['calls']} | {health['failures']} | {warm} |"
+            )
+        st.markdown("\n".join(health_lines))
+
+        memory = get_session_store().stats()
+        rss = "–" if memory["rss_bytes"] is None else f"{memory['rss_bytes'] / 2**20:,.0f} MiB"
+        st.markdown("**Session memory**")
+        st.caption(
+            f"{memory['sessions']} sessions ({memory['offloaded']} offloaded) · "
+            f"{memory['bytes'] / 1024:,.0f} KiB in memory · {memory['offloaded_bytes'] / 1024:,.0f} KiB on disk · "
+            f"process RSS {rss}"
+        )
+        memory_lines = ["| Session | KiB | On disk KiB | Idle s |", "|---|---:|---:|---:|"]
+        for session in memory["per_session"][:10]:
+            memory_lines.append(
+                f"| {session['id'][:12]} | {session['bytes'] / 1024:,.1f} | "
+                f"{session['offloaded_bytes'] / 1024:,.1f} | {session['idle_seconds']:,.0f} |"
+            )
+        st.markdown("\n".join(memory_lines))
+
+        tokens = metrics.counter_totals("recipe_tokens_total", label="kind")
+        fallbacks = sum(metrics.counter_totals("recipe_fallbacks_total").values())
+        st.caption(
+            f"Tokens: {tokens.get('prompt', 0):,} prompt · {tokens.get('output', 0):,} output · "
+            f"{fallbacks} fallback generations"
+        )
+        st.download_button(
+            "📈 Prometheus metrics",
+            metrics.render_prometheus(),
+            "metrics.prom",
+            "text/plain",
+            use_container_width=True
+        )
+
+
+def warn_if_pantry_full():
+    # Left for the next run: the import buttons rerun straight after adding
+    ingredients = st.session_state.ingredients
+    if ingredients.full:
+        st.session_state.flash.append((
+            "warning",
+            f"⚠️ Your pantry is full ({ingredients.max_items} ingredients); anything beyond that was not added. "
+            "Remove some ingredients to add more.",
+        ))
+
+@st.fragment
+def render_ingredient_panel():
     st.markdown("""
-    <div style="background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%); 
-                padding: 25px; 
-                border-radius: 20px; 
+    <div style="background: linear-gradient(135deg, #1a1a2e 0%, #16213e 100%);
+                padding: 25px;
+                border-radius: 20px;
                 box-shadow: 0 8px 32px rgba(0, 0, 0, 0.2);
                 border: 1px solid rgba(255, 255, 255, 0.1);">
-        <h2 style="margin: 0 0 20px 0; 
-                   color: #ffffff; 
-                   font-weight: 700; 
+        <h2 style="margin: 0 0 20px 0;
+                   color: #ffffff;
+                   font-weight: 700;
                    text-align: center;
                    text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);">
             <span style="font-size: 35px;">🛒</span> Your Ingredients
         </h2>
     </div>
     """, unsafe_allow_html=True)
-    
+
     # Input methods with enhanced tabs
     tab1, tab2, tab3 = st.tabs(["➕ Add Single", "📋 Add Multiple", "🎲 Quick Add"])
-    
+
     with tab1:
         # Single ingredient input
         single_ingredient = st.text_input("Enter an ingredient:", placeholder="e.g., Tomatoes")
         if st.button("Add Ingredient", key="add_single", use_container_width=True):
             if single_ingredient:
-                st.session_state.ingredients_list.append(single_ingredient.strip())
+                st.session_state.ingredients.add(single_ingredient)
+                warn_if_pantry_full()
                 st.balloons()
                 st.success(f"✅ Added: {single_ingredient}")
                 st.rerun()
-    
+
     with tab2:
         # Multiple ingredients input
         ingredients_input = st.text_area(
@@ -338,62 +450,92 @@ with col1:
         )
         if st.button("Add All Ingredients", key="add_multiple", use_container_width=True):
             if ingredients_input:
-                # Handle both comma-separated and newline-separated input
-                if ',' in ingredients_input:
-                    new_items = [i.strip() for i in ingredients_input.split(",") if i.strip()]
-                else:
-                    new_items = [i.strip() for i in ingredients_input.split("\n") if i.strip()]
-                
-                st.session_state.ingredients_list.extend(new_items)
-                st.success(f"✅ Added {len(new_items)} ingredients!")
+                # Newlines, commas and semicolons all separate items; duplicates are merged
+                added = st.session_state.ingredients.bulk_import(ingredients_input)
+                warn_if_pantry_full()
+                st.success(f"✅ Added {added} ingredients!")
                 st.rerun()
-    
+
+        # Pantry exports and receipts are parsed as a stream and added in one state update
+        uploaded = st.file_uploader(
+            "Or import a pantry export or grocery receipt:",
+            type=["csv", "tsv", "json", "jsonl", "ndjson", "txt"],
+            key="pantry_file",
+        )
+        is_receipt = st.checkbox("This is a grocery receipt", key="pantry_receipt",
+                                 help="Only priced lines are imported; store headers and totals are skipped")
+        if st.button("Import File", key="import_file", use_container_width=True, disabled=uploaded is None):
+            uploaded.seek(0)
+            added = st.session_state.ingredients.import_items(
+                iter_pantry_items(uploaded, uploaded.name, receipt=is_receipt)
+            )
+            warn_if_pantry_full()
+            st.success(f"✅ Imported {added} ingredients from {uploaded.name}!")
+            st.rerun()
+
     with tab3:
         # Quick ingredient suggestions
         st.markdown("**Popular Ingredients:**")
-        
-        # Categories of suggestions
-        categories = {
-            "🥩 Proteins": ["Chicken", "Beef", "Fish", "Tofu", "Eggs", "Shrimp"],
-            "🥬 Vegetables": ["Tomatoes", "Onions", "Garlic", "Bell Peppers", "Broccoli", "Spinach"],
-            "🍚 Grains": ["Rice", "Pasta", "Quinoa", "Bread", "Couscous", "Noodles"],
-            "🧀 Dairy": ["Cheese", "Milk", "Butter", "Yogurt", "Cream", "Sour Cream"]
-        }
-        
-        for category, items in categories.items():
+
+        for category, items in QUICK_ADD_CATEGORIES.items():
             st.markdown(f"**{category}**")
             cols = st.columns(3)
             for idx, item in enumerate(items):
                 with cols[idx % 3]:
                     if st.button(item, key=f"quick_{item}", use_container_width=True):
-                        st.session_state.ingredients_list.append(item)
+                        st.session_state.ingredients.add(item)
+                        warn_if_pantry_full()
                         st.rerun()
-    
+
     # Display current ingredients
-    if st.session_state.ingredients_list:
+    if st.session_state.ingredients:
         st.markdown("### 📝 Current Ingredients:")
-        
-        # Create a nice display for ingredients
-        ingredients_container = st.container()
-        with ingredients_container:
-            for idx, ing in enumerate(st.session_state.ingredients_list):
-                col_ing, col_btn = st.columns([5, 1])
-                with col_ing:
-                    st.markdown(f"<span class='ingredient-tag'>🥘 {ing}</span>", unsafe_allow_html=True)
-                with col_btn:
-                    if st.button("❌", key=f"remove_{idx}"):
-                        st.session_state.ingredients_list.pop(idx)
-                        st.rerun()
-        
+
+        # One grid per page instead of two columns and a button per ingredient,
+        # so reruns cost the same for 10 or 1,000 items
+        ingredients = st.session_state.ingredients
+        pages = max(1, math.ceil(len(ingredients) / INGREDIENT_PAGE_SIZE))
+        if st.session_state.get("ingredient_page", 1) > pages:
+            st.session_state.ingredient_page = pages
+        page = 1
+        if pages > 1:
+            page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="ingredient_page")
+        start = (page - 1) * INGREDIENT_PAGE_SIZE
+        page_items = list(islice(ingredients.items(), start, start + INGREDIENT_PAGE_SIZE))
+        page_keys = [key for key, _ in page_items]
+
+        edited = st.data_editor(
+            {
+                "remove": [False] * len(page_items),
+                "ingredient": [f"🥘 {name}" for _, name in page_items],
+                "quantity": [ingredients.quantity(key) for key in page_keys],
+            },
+            column_config={
+                "remove": st.column_config.CheckboxColumn("❌", width="small"),
+                "ingredient": st.column_config.TextColumn("Ingredient"),
+                "quantity": st.column_config.TextColumn("Quantity", width="small"),
+            },
+            disabled=["ingredient", "quantity"],
+            hide_index=True,
+            use_container_width=True,
+            # A new key whenever the page's rows change, so ticks never land on the wrong row
+            key=f"ingredient_editor_{hash(tuple(page_keys))}",
+        )
+        selected = [key for key, tick in zip(page_keys, edited["remove"]) if tick]
+
         # Action buttons
-        col_clear, col_export = st.columns(2)
+        col_remove, col_clear, col_export = st.columns(3)
+        with col_remove:
+            if st.button(f"❌ Remove Selected ({len(selected)})", disabled=not selected, use_container_width=True):
+                ingredients.remove_many(selected)
+                st.rerun()
         with col_clear:
             if st.button("🗑️ Clear All", type="secondary", use_container_width=True):
-                st.session_state.ingredients_list = []
+                st.session_state.ingredients.clear()
                 st.rerun()
         with col_export:
             # Export ingredients list
-            ingredients_text = "\n".join(st.session_state.ingredients_list)
+            ingredients_text = "\n".join(st.session_state.ingredients)
             st.download_button(
                 "📥 Export List",
                 ingredients_text,
@@ -404,185 +546,471 @@ with col1:
     else:
         st.info("👆 Start by adding some ingredients above!")
 
-with col2:
+
+def current_request(recipe_count):
+    """Canonical request for the current pantry, preferences and model."""
+    # Canonical, de-duplicated names keep prompts and cache keys identical for equivalent pantries
+    return canonical_request(
+        st.session_state.ingredients.canonical(), st.session_state.time_pref, st.session_state.difficulty,
+        st.session_state.dietary, st.session_state.cuisine, st.session_state.meal_type,
+        MODEL_OPTIONS[st.session_state.model_label], recipe_count,
+    )
+
+
+def compile_prompts(recipe_count, parallel_mode):
+    """Compiled prompts for the current pantry and preferences: one, or one per recipe in parallel mode."""
+    return compile_request(current_request(recipe_count), parallel_mode, budget=prompt_budget())
+
+
+def finish_trace(trace, started):
+    """Close out one request's metrics record."""
+    metrics = get_metrics()
+    trace["total_seconds"] = round(time.perf_counter() - started, 4)
+    metrics.inc("recipe_requests_total", help="Generate clicks by where the recipes came from", source=trace["source"])
+    metrics.observe("recipe_request_seconds", trace["total_seconds"], help="Generate click to result", source=trace["source"])
+    metrics.log(trace)
+
+
+def generate_recipes(recipe_count, parallel_mode):
+    """Answer from the caches or the recipe library, or start a background generation job.
+
+    Returns True when recipes were stored in session state right away;
+    otherwise the new job's id is left in ``st.session_state.job_id``.
+    Every request leaves one structured record in the metrics log.
+    """
+    metrics = get_metrics()
+    started = time.perf_counter()
+    service = get_recipe_service(api_key)
+    cache_request = current_request(recipe_count)
+    selected_model = cache_request["model"]
+    stream_output = st.session_state.stream_output
+    trace = {
+        "model": selected_model,
+        "recipe_count": recipe_count,
+        "mode": "parallel" if parallel_mode and recipe_count > 1 else "single",
+        "source": "error",
+    }
+
+    # Serve repeat and near-duplicate requests from the response caches, unless fresh recipes were asked for
+    fresh = st.session_state.fresh_recipes
+    source, cached_recipes, similarity = (None, [], 0.0) if fresh else service.cached(
+        cache_request, use_history=st.session_state.reuse_history
+    )
+    if cached_recipes:
+        session_workspace().set_recipes(cached_recipes)
+        st.session_state.recipe_count += len(cached_recipes)
+        if source == "cache":
+            message = "✅ Recipes loaded from cache!"
+        elif source == "history":
+            message = "📜 Recipes loaded from your recipe history!"
+        else:
+            message = f"✅ Recipes loaded from a similar earlier request ({similarity:.0%} match)!"
+        st.session_state.flash.append(("success", message))
+        trace["source"] = source
+        finish_trace(trace, started)
+        return True
+
+    # Pantry combinations the local library already covers need no model call
+    library_matches = service.library_matches(cache_request)
+    strong_matches = [recipe for score, recipe in library_matches if score >= LIBRARY_MIN_SCORE]
+    if st.session_state.library_first and not fresh and len(strong_matches) >= recipe_count:
+        session_workspace().set_recipes(strong_matches)
+        st.session_state.recipe_count += len(strong_matches)
+        st.session_state.flash.append(("success", "📚 Recipes served from your recipe library!"))
+        trace["source"] = "library"
+        finish_trace(trace, started)
+        return True
+
+    # Create the prompt(s), sized to the input budget with an output budget per recipe
+    prompt_started = time.perf_counter()
+    compiled = compile_request(cache_request, parallel_mode, budget=prompt_budget())
+    trace["prompt_build_seconds"] = round(time.perf_counter() - prompt_started, 5)
+    metrics.observe("recipe_prompt_build_seconds", trace["prompt_build_seconds"], help="Prompt compilation")
+    trace["input_tokens_estimate"] = sum(one.input_tokens for one in compiled)
+
+    # The policy hedges onto the other model if the selected one is slow or failing
+    if not service.policy.breaker(selected_model).allow():
+        st.session_state.flash.append(
+            ("info", f"⏭️ {selected_model} has been failing repeatedly, using a fallback model for now.")
+        )
+
+    def run_job(job):
+        # Runs on the job pool: report through ``job`` only, never through st.*
+        def show_progress(done, total):
+            job.progress = (done, total)
+
+        def show_partial(recipes):
+            job.partial = recipes
+
+        try:
+            used_model, recipes = service.generate(
+                cache_request, compiled, stream=stream_output,
+                on_partial=show_partial, on_progress=show_progress, trace=trace,
+            )
+            if not recipes:
+                return {"recipes": [], "messages": [("error", "No response received. Please try again.")]}
+            trace["source"] = "model"
+            if used_model == selected_model:
+                message = "✅ Recipes generated successfully!"
+            else:
+                message = f"✅ Success with {used_model}!"
+            return {"recipes": recipes, "new": True, "messages": [("success", message), ("balloons", "")]}
+
+        except Exception as e:
+            trace["error"] = str(e)
+            if not library_matches:
+                raise
+            # Keep the app useful while the API is down: show the closest saved recipes
+            trace["source"] = "library_fallback"
+            return {
+                "recipes": [recipe for _, recipe in library_matches],
+                "messages": [
+                    ("warning", f"⚠️ Couldn't reach the model ({e}); showing the closest recipes from your library.")
+                ],
+            }
+        finally:
+            finish_trace(trace, started)
+
+    st.session_state.job_id = get_job_manager().submit(run_job, label="Creating your personalized recipes...")
+    return False
+
+
+def refine_recipe(index, instruction):
+    """Start a background job that rewrites recipe ``index`` per ``instruction``, leaving the others alone."""
+    started = time.perf_counter()
+    service = get_recipe_service(api_key)
+    workspace = session_workspace()
+    recipes = workspace.recipes
+    recipe = recipes[index]
+    # Last chat exchange for this recipe, so a follow-up tweak doesn't resend it
+    history = workspace.chat(recipe_key(recipe))
+    selected_model = MODEL_OPTIONS[st.session_state.model_label]
+    trace = {"model": selected_model, "recipe_count": 1, "mode": "refine", "source": "error"}
+
+    def run_job(job):
+        try:
+            used_model, refined, new_history = service.refine(recipe, instruction, selected_model, history, trace)
+            trace["source"] = "refine"
+            recipes[index] = refined
+            return {
+                "recipes": recipes,
+                "history": (recipe_key(refined), new_history),
+                "messages": [("success", f"✏️ Updated {refined.name}!")],
+            }
+        except Exception as e:
+            trace["error"] = str(e)
+            raise
+        finally:
+            finish_trace(trace, started)
+
+    st.session_state.job_id = get_job_manager().submit(run_job, label=f"Updating {recipe.name}...")
+
+
+@st.fragment(run_every=0.5)
+def render_job_progress():
+    job = get_job_manager().get(st.session_state.job_id)
+    if job is not None and not job.done:
+        # Poll the background job: progress and whatever has been parsed so far
+        st.markdown(f"🧑‍🍳 {job.label} ({job.elapsed():.0f}s)")
+        if job.progress:
+            done, total = job.progress
+            st.progress(done / total, text=f"{done} of {total} recipes ready")
+        if job.partial:
+            st.markdown('<div class="recipe-card">', unsafe_allow_html=True)
+            st.markdown(recipes_to_markdown(job.partial) + " ▌")
+            st.markdown("</div>", unsafe_allow_html=True)
+        return
+
+    # Finished (or gone after a restart): collect the result into this session
+    get_job_manager().pop(st.session_state.job_id)
+    st.session_state.job_id = None
+    if job is None:
+        st.session_state.flash.append(("error", "⚠️ The generation job was lost, please try again."))
+    elif job.status == "failed":
+        st.session_state.flash.append(("error", f"⚠️ Error generating recipes: {job.error}"))
+    else:
+        result = job.result
+        workspace = session_workspace()
+        if result["recipes"]:
+            workspace.set_recipes(result["recipes"])
+            if result.get("new"):
+                st.session_state.recipe_count += len(result["recipes"])
+        if result.get("history"):
+            workspace.remember_chat(*result["history"])
+        st.session_state.flash.extend(result["messages"])
+    # Refresh the stats row and recipe panel outside this fragment
+    st.rerun()
+
+
+@st.fragment
+def render_generation_panel():
     st.markdown("""
-    <div style="background: linear-gradient(135deg, #0f3460 0%, #16213e 100%); 
-                padding: 25px; 
-                border-radius: 20px; 
+    <div style="background: linear-gradient(135deg, #0f3460 0%, #16213e 100%);
+                padding: 25px;
+                border-radius: 20px;
                 box-shadow: 0 8px 32px rgba(0, 0, 0, 0.2);
                 border: 1px solid rgba(255, 255, 255, 0.1);">
-        <h2 style="margin: 0 0 20px 0; 
-                   color: #ffffff; 
-                   font-weight: 700; 
+        <h2 style="margin: 0 0 20px 0;
+                   color: #ffffff;
+                   font-weight: 700;
                    text-align: center;
                    text-shadow: 2px 2px 4px rgba(0, 0, 0, 0.3);">
             <span style="font-size: 35px;">🔥</span> Recipe Generation
         </h2>
     </div>
     """, unsafe_allow_html=True)
-    
-    if st.session_state.ingredients_list:
-        st.write(f"**Ready to cook with {len(st.session_state.ingredients_list)} ingredients!**")
-        
+
+    # Messages left by the previous run's generation
+    for kind, message in st.session_state.flash:
+        if kind == "balloons":
+            st.balloons()
+        elif kind == "warning":
+            st.warning(message)
+        elif kind == "info":
+            st.info(message)
+        elif kind == "error":
+            st.error(message)
+
+            # Provide helpful debugging information
+            with st.expander("🔍 Error Details"):
+                st.code(message)
+                st.write("\nPossible solutions:")
+                st.write("1. Check if your API key is valid")
+                st.write("2. Try again in a few moments")
+                st.write("3. Check your API quota at Google AI Studio")
+        else:
+            st.success(message)
+    st.session_state.flash = []
+
+    if st.session_state.ingredients:
+        st.write(f"**Ready to cook with {len(st.session_state.ingredients)} ingredients!**")
+
         # Recipe count selector
         recipe_count = st.slider("Number of recipes to generate:", 1, 5, 3)
-        
-        if st.button("🎯 Generate Recipes", type="primary", use_container_width=True):
-            with st.spinner("🧑‍🍳 Creating your personalized recipes..."):
-                # Clean preferences for prompt
-                clean_time = time_pref.split()[-1]
-                clean_difficulty = difficulty.split()[-1]
-                clean_dietary = [d.split()[-1] for d in dietary]
-                clean_cuisine = cuisine.split()[-1]
-                clean_meal = meal_type.split()[-1]
-                
-                # Create the prompt
-                dietary_text = f"Dietary restrictions: {', '.join(clean_dietary)}" if clean_dietary else "No dietary restrictions"
-                cuisine_text = f"Cuisine preference: {clean_cuisine}" if clean_cuisine != "Any" else ""
-                meal_text = f"Meal type: {clean_meal}" if clean_meal != "Any" else ""
-                
-                prompt = f"""
-                Create exactly {recipe_count} unique and detailed recipes using these ingredients: {', '.join(st.session_state.ingredients_list)}
-                
-                Requirements:
-                - Cooking time: {clean_time}
-                - Difficulty level: {clean_difficulty}
-                - {dietary_text}
-                {cuisine_text}
-                {meal_text}
-                
-                For each recipe, provide:
-                1. Recipe Name (creative and appealing)
-                2. Brief Description (2-3 sentences)
-                3. Prep Time and Cook Time
-                4. Servings
-                5. Complete Ingredients List with measurements
-                6. Step-by-step Instructions (numbered)
-                7. Chef's Tips or Variations
-                8. Nutritional highlights (brief)
-                
-                Format the output clearly with headers and bullet points.
-                Make the recipes practical, delicious, and easy to follow!
-                """
-                
-                try:
-                    # Initialize the model
-                    model = genai.GenerativeModel(selected_model)
-                    
-                    # Generate content with safety settings
-                    generation_config = {
-                        "temperature": 0.7,
-                        "top_p": 0.9,
-                        "max_output_tokens": 2048,
-                    }
-                    
-                    response = model.generate_content(
-                        prompt,
-                        generation_config=generation_config
-                    )
-                    
-                    if response.text:
-                        st.session_state.recipes = response.text
-                        st.session_state.recipe_count += recipe_count
-                        st.success("✅ Recipes generated successfully!")
-                        st.balloons()
-                    else:
-                        st.error("No response received. Please try again.")
-                        
-                except Exception as e:
-                    st.error(f"⚠️ Error generating recipes: {str(e)}")
-                    
-                    # Provide helpful debugging information
-                    with st.expander("🔍 Error Details"):
-                        st.code(str(e))
-                        
-                        # If the first model fails, try the other one
-                        if selected_model == "gemini-1.5-pro":
-                            fallback_model = "gemini-1.5-flash"
-                        else:
-                            fallback_model = "gemini-1.5-pro"
-                        
-                        st.write(f"Trying fallback model: {fallback_model}...")
-                        
-                        try:
-                            model = genai.GenerativeModel(fallback_model)
-                            response = model.generate_content(
-                                prompt,
-                                generation_config=generation_config
-                            )
-                            if response.text:
-                                st.session_state.recipes = response.text
-                                st.session_state.recipe_count += recipe_count
-                                st.success(f"✅ Success with {fallback_model}!")
-                        except Exception as e2:
-                            st.error(f"❌ Fallback also failed: {str(e2)}")
-                            st.write("\nPossible solutions:")
-                            st.write("1. Check if your API key is valid")
-                            st.write("2. Try again in a few moments")
-                            st.write("3. Check your API quota at Google AI Studio")
+
+        # Generation mode
+        parallel_mode = st.radio(
+            "Generation mode:",
+            ["📦 Single request", "🚀 Parallel (one request per recipe)"],
+            horizontal=True
+        ).startswith("🚀")
+
+        # Token accounting for what the Generate button would send
+        compiled = compile_prompts(recipe_count, parallel_mode)
+        input_tokens = sum(one.input_tokens for one in compiled)
+        output_tokens = sum(one.max_output_tokens for one in compiled)
+        st.caption(
+            f"🧮 ~{input_tokens:,} input tokens · up to {output_tokens:,} output tokens"
+            f" across {len(compiled)} request{'s' if len(compiled) > 1 else ''}"
+        )
+        if compiled[0].ingredients_dropped:
+            st.caption(
+                f"✂️ {compiled[0].ingredients_dropped} ingredients left out to stay within the "
+                f"{prompt_budget():,}-token prompt budget"
+            )
+
+        # One generation at a time per session; the running job keeps going across reruns
+        job_running = st.session_state.job_id is not None
+        if st.button("🎯 Generate Recipes", type="primary", use_container_width=True, disabled=job_running):
+            generate_recipes(recipe_count, parallel_mode)
+            # Show the served recipes, or start polling the new job
+            st.rerun()
     else:
         st.info("👈 Add ingredients from the left panel to get started!")
-        
+
         # Motivation message
         st.markdown("""
         ### 💡 Recipe Ideas Await!
-        
+
         Add your available ingredients and let AI create amazing recipes tailored to your preferences.
-        
+
         **Pro Tips:**
         - Add at least 3-5 ingredients for best results
         - Mix proteins, vegetables, and grains
         - Don't forget seasonings and spices!
         """)
 
-# Display generated recipes
-if st.session_state.recipes:
+
+@st.fragment
+def render_recipes():
     st.markdown("---")
     st.markdown("""
     <div style="text-align: center; margin: 20px 0;">
         <h2 style="color: #4a5568;">📖 Your Personalized Recipes</h2>
     </div>
     """, unsafe_allow_html=True)
-    
-    # Display recipes in a nice format
+
+    # Display each recipe in its own card
     recipes_container = st.container()
-    with recipes_container:
-        st.markdown("""
-        <div class="recipe-card">
-        """, unsafe_allow_html=True)
-        
-        st.markdown(st.session_state.recipes)
-        
-        st.markdown("</div>", unsafe_allow_html=True)
-    
+    render_timer = get_metrics().timer("recipe_render_seconds", help="Markdown render of the recipe panel")
+    with recipes_container, render_timer:
+        job_running = st.session_state.job_id is not None
+        recipes = session_workspace().recipes
+        for idx, recipe in enumerate(recipes):
+            st.markdown("""
+            <div class="recipe-card">
+            """, unsafe_allow_html=True)
+
+            # Collapsed recipes send only their title; the body is built when opened
+            shown = st.toggle(f"📖 **{recipe.name}**", value=idx == 0, key=f"show_recipe_{idx}")
+            if not shown:
+                st.markdown("</div>", unsafe_allow_html=True)
+                continue
+            st.markdown(recipe.to_markdown())
+
+            # Change just this recipe; the others stay as they are
+            with st.popover("✏️ Tweak this recipe", disabled=job_running):
+                instruction = st.text_input(
+                    "What should change?",
+                    placeholder="e.g., make it vegan, swap beef for tofu",
+                    key=f"refine_text_{idx}",
+                )
+                if st.button("Update Recipe", key=f"refine_{idx}", disabled=not instruction.strip()):
+                    refine_recipe(idx, instruction)
+                    st.rerun()
+
+            st.markdown("</div>", unsafe_allow_html=True)
+
     # Action buttons for recipes
     st.markdown("<br>", unsafe_allow_html=True)
     col_save, col_print, col_share, col_new = st.columns(4)
-    
+
     with col_save:
         # Save recipes
         st.download_button(
             "💾 Save Recipes",
-            st.session_state.recipes,
+            recipes_to_markdown(recipes),
             f"recipes_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt",
             "text/plain",
             use_container_width=True
         )
-    
+
     with col_print:
         if st.button("🖨️ Print View", use_container_width=True):
             st.info("Use Ctrl+P (or Cmd+P on Mac) to print this page")
-    
+
     with col_share:
         # Copy to clipboard (using a workaround)
         if st.button("📋 Copy Text", use_container_width=True):
             st.info("Select the text above and copy manually (Ctrl+C / Cmd+C)")
-    
+
     with col_new:
         if st.button("🔄 New Recipes", use_container_width=True):
-            st.session_state.recipes = []
+            session_workspace().set_recipes([])
             st.rerun()
 
+
+@st.fragment
+def render_history_panel():
+    st.markdown("---")
+    # Off by default so ordinary reruns don't query the history
+    if not st.toggle("🕘 Browse recipe history", key="show_history"):
+        return
+
+    col_query, col_cuisine, col_dietary = st.columns([2, 1, 1])
+    with col_query:
+        query = st.text_input("Search by ingredient or recipe name:", placeholder="e.g., chicken rice",
+                              key="history_query")
+    with col_cuisine:
+        cuisine = st.selectbox("Cuisine:", CUISINE_OPTIONS, key="history_cuisine")
+    with col_dietary:
+        dietary = st.multiselect("Dietary:", DIETARY_OPTIONS, key="history_dietary")
+
+    # Keyset pagination: a stack of "before" cursors, reset whenever the filters change
+    filters = (query, cuisine, tuple(dietary))
+    if st.session_state.get("history_filters") != filters:
+        st.session_state.history_filters = filters
+        st.session_state.history_cursors = [None]
+    cursors = st.session_state.history_cursors
+    entries = get_recipe_history().search(
+        query, clean_label(cuisine), dietary=[clean_label(d) for d in dietary],
+        limit=HISTORY_PAGE_SIZE + 1, before=cursors[-1],
+    )
+    has_older = len(entries) > HISTORY_PAGE_SIZE
+    entries = entries[:HISTORY_PAGE_SIZE]
+
+    if not entries:
+        st.info("No saved recipes match yet. Generated recipes are kept here automatically.")
+    for entry in entries:
+        col_name, col_use = st.columns([5, 1])
+        with col_name:
+            details = [datetime.fromtimestamp(entry.created).strftime("%Y-%m-%d %H:%M")]
+            details += [value for value in (entry.cuisine, entry.meal, entry.dietary) if value and value != "Any"]
+            details.append(entry.model)
+            st.markdown(f"**{entry.recipe.name}**  \n<small>{' · '.join(details)}</small>", unsafe_allow_html=True)
+        with col_use:
+            if st.button("Open", key=f"history_open_{entry.id}", use_container_width=True):
+                session_workspace().set_recipes([entry.recipe])
+                st.rerun()
+
+    col_newer, col_page, col_older = st.columns([1, 1, 1])
+    with col_newer:
+        if st.button("⬅️ Newer", disabled=len(cursors) == 1, use_container_width=True):
+            cursors.pop()
+            st.rerun(scope="fragment")
+    with col_page:
+        st.caption(f"Page {len(cursors)}")
+    with col_older:
+        if st.button("Older ➡️", disabled=not has_older, use_container_width=True):
+            cursors.append(entries[-1].id)
+            st.rerun(scope="fragment")
+
+
+# Sidebar with gradient (widgets rerun only the sidebar fragment)
+with st.sidebar:
+    render_sidebar()
+
+# Main content area with better layout
+# Stats row
+if st.session_state.ingredients:
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.markdown(f"""
+        <div class="stat-card">
+            <div class="stat-number">{len(st.session_state.ingredients)}</div>
+            <div style="color: #6b7280; font-weight: 600;">Ingredients</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col2:
+        st.markdown(f"""
+        <div class="stat-card">
+            <div class="stat-number">{get_recipe_history().recipe_total()}</div>
+            <div style="color: #6b7280; font-weight: 600;">Recipes Generated</div>
+            <div style="color: #9ca3af; font-size: 0.8rem;">{st.session_state.recipe_count} this session</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with col3:
+        st.markdown(f"""
+        <div class="stat-card">
+            <div class="stat-number">{"✨"}</div>
+            <div style="color: #6b7280; font-weight: 600;">Ready to Cook</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+st.markdown("<br>", unsafe_allow_html=True)
+
+# Main content columns
+col1, col2 = st.columns([3, 2])
+
+with col1:
+    render_ingredient_panel()
+
+with col2:
+    render_generation_panel()
+    if st.session_state.job_id:
+        render_job_progress()
+
+# Display generated recipes
+workspace = session_workspace()
+# The pantry stays in session state; report its size with the rest of this session's state
+workspace.account("ingredients", st.session_state.ingredients.nbytes())
+if workspace.recipes:
+    render_recipes()
+
+render_history_panel()
+
 # Footer
 st.markdown("---")
 st.markdown(
@@ -596,3 +1024,7 @@ st.markdown(
     """,
     unsafe_allow_html=True
 )
+
+# Pre-warm after the first paint: everything above is already on screen while the
+# Gemini SDK is imported and connected in the background for the first Generate click
+prewarm_clients(api_key)
@@ -0,0 +1,260 @@
+"""Generate recipes for a file of requests without the Streamlit UI.
+
+Each input line is one JSON request; every field but ``ingredients`` is
+optional and defaults to the sidebar's defaults:
+
+    {"id": "weeknight-1", "ingredients": ["chicken", "rice"], "time": "15-30 min",
+     "difficulty": "Easy", "dietary": ["Gluten-Free"], "cuisine": "Asian", "meal": "Dinner",
+     "model": "gemini-1.5-flash", "recipe_count": 3, "parallel": false}
+
+Results stream to the output file as one JSON line per request, written as
+each finishes. The output doubles as the checkpoint: rerunning with the
+same output file skips requests that already succeeded and retries the
+ones that failed. Invalid lines (bad JSON, or fields the app could never
+send, such as a bare ingredient string or more than 5 recipes) get an
+error record too and don't stop the run. Generated recipes land in the same on-disk caches the app
+reads (``RECIPE_CACHE_DIR``) and in the recipe history, so a nightly run
+pre-warms them. ``--history`` also answers requests from the history
+(generations up to 30 days old) once the response cache has let them go.
+
+    GEMINI_API_KEY=... python batch.py requests.jsonl -o results.jsonl --concurrency 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from client_pool import ClientRegistry
+from fallback_policy import FallbackPolicy
+from gateway import DEFAULT_LIMITS, FALLBACK_LIMITS, GenerationGateway
+from metrics import Metrics
+from preferences import MODEL_OPTIONS, canonical_request, request_key
+from prompts import DEFAULT_INPUT_BUDGET
+from recipe_cache import CACHE_DIR, RecipeCache
+from recipe_history import RecipeHistory
+from recipe_service import RecipeService, compile_request
+from semantic_cache import DEFAULT_THRESHOLD, SemanticCache
+
+DEFAULTS = {
+    "time": "30-45 min",
+    "difficulty": "Easy",
+    "dietary": [],
+    "cuisine": "Any",
+    "meal": "Any",
+    "model": next(iter(MODEL_OPTIONS.values())),
+    "recipe_count": 3,
+    "parallel": False,
+}
+# Same range as the app's "Number of recipes" slider
+MAX_RECIPE_COUNT = 5
+
+
+def check_fields(fields):
+    """Raise ValueError for request fields the app itself could never send."""
+    ingredients = fields["ingredients"]
+    if not isinstance(ingredients, list) or not ingredients or not all(isinstance(i, str) for i in ingredients):
+        raise ValueError("ingredients must be a non-empty list of strings")
+    if not isinstance(fields["dietary"], list) or not all(isinstance(d, str) for d in fields["dietary"]):
+        raise ValueError("dietary must be a list of strings")
+    for name in ("time", "difficulty", "cuisine", "meal", "model"):
+        if not isinstance(fields[name], str):
+            raise ValueError(f"{name} must be a string")
+    count = fields["recipe_count"]
+    if not isinstance(count, int) or isinstance(count, bool) or not 1 <= count <= MAX_RECIPE_COUNT:
+        raise ValueError(f"recipe_count must be an integer from 1 to {MAX_RECIPE_COUNT}")
+
+
+def read_requests(path):
+    """Yield ``(id, canonical request, parallel, error)`` for each line of a JSONL request file.
+
+    Invalid lines yield ``request=None`` and the reason in ``error``; their id
+    is the line's ``id`` when it has one, otherwise ``line-<number>``.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            raw = {}
+            try:
+                raw = json.loads(line)
+                fields = dict(DEFAULTS, **raw)
+                check_fields(fields)
+                # Model may be given as the sidebar label or the model id
+                model = MODEL_OPTIONS.get(fields["model"], fields["model"])
+                request = canonical_request(
+                    fields["ingredients"], fields["time"], fields["difficulty"], fields["dietary"],
+                    fields["cuisine"], fields["meal"], model, fields["recipe_count"],
+                )
+                if not request["ingredients"]:
+                    raise ValueError("ingredients has no usable names")
+            except (ValueError, KeyError, TypeError) as e:
+                request_id = raw.get("id") if isinstance(raw, dict) else None
+                yield str(request_id or f"line-{line_no}"), None, False, f"{path}:{line_no}: invalid request ({e})"
+                continue
+            # Without an explicit id, the request's cache key identifies it across runs
+            yield str(raw.get("id") or request_key(request)), request, bool(fields["parallel"]), None
+
+
+def completed_ids(path):
+    """Ids that already have a successful result in an earlier run's output."""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            if "recipes" in record:
+                done.add(record["id"])
+    return done
+
+
+def ends_mid_line(path):
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def run_one(service, request_id, request, parallel, budget, refresh, use_history=False):
+    started = time.perf_counter()
+    source, recipes, _ = (None, [], 0.0) if refresh else service.cached(request, use_history=use_history)
+    model = request["model"]
+    if not recipes:
+        compiled = compile_request(request, parallel, budget=budget)
+        model, recipes = service.generate(request, compiled)
+        source = "model"
+    if not recipes:
+        raise ValueError("No response received")
+    return {
+        "id": request_id,
+        "key": request_key(request),
+        "source": source,
+        "model": model,
+        "seconds": round(time.perf_counter() - started, 3),
+        "recipes": [recipe.to_dict() for recipe in recipes],
+    }
+
+
+def run_batch(service, requests, out, concurrency=4, budget=DEFAULT_INPUT_BUDGET, refresh=False, done=(), log=None,
+              use_history=False):
+    """Run ``requests`` with at most ``concurrency`` in flight, writing one result line to ``out`` per request.
+
+    Requests whose id is in ``done`` are skipped; invalid ones get an error
+    record without a call. Returns ``{outcome: count}``.
+    """
+    log = log or (lambda message: None)
+    counts = {"skipped": 0, "cache": 0, "similar": 0, "history": 0, "model": 0, "invalid": 0, "error": 0}
+    pending = {}
+
+    def write(record):
+        out.write(json.dumps(record, ensure_ascii=False) + "\n")
+        out.flush()
+
+    def collect(finished):
+        for future in finished:
+            request_id = pending.pop(future)
+            try:
+                record = future.result()
+                counts[record["source"]] += 1
+                log(f"{request_id}: {len(record['recipes'])} recipes from {record['source']} ({record['seconds']:.1f}s)")
+            except Exception as e:
+                record = {"id": request_id, "error": str(e)}
+                counts["error"] += 1
+                log(f"{request_id}: failed: {e}")
+            write(record)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as pool:
+        for request_id, request, parallel, error in requests:
+            if request_id in done:
+                counts["skipped"] += 1
+                continue
+            if error:
+                counts["invalid"] += 1
+                log(error)
+                write({"id": request_id, "error": error})
+                continue
+            # Bounded window: a large input file is read as work frees up, not all at once
+            while len(pending) >= concurrency * 2:
+                finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                collect(finished)
+            future = pool.submit(run_one, service, request_id, request, parallel, budget, refresh, use_history)
+            pending[future] = request_id
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            collect(finished)
+    return counts
+
+
+def build_service(api_key, rpm=None, tpm=None, threshold=DEFAULT_THRESHOLD):
+    # Imported here so --help and argument errors don't pay for the SDK import
+    import google.generativeai as genai
+
+    metrics = Metrics()
+    overrides = {k: v for k, v in (("rpm", rpm), ("tpm", tpm)) if v}
+    limits = {
+        model: dict(DEFAULT_LIMITS.get(model, FALLBACK_LIMITS), **overrides)
+        for model in MODEL_OPTIONS.values()
+    } if overrides else {}
+    return RecipeService(
+        ClientRegistry(genai, api_key, metrics=metrics),
+        # Batch runs wait for rate-limit budget instead of failing fast like the UI
+        GenerationGateway(limits=limits, acquire_timeout=None),
+        FallbackPolicy(log_path=os.path.join(CACHE_DIR, "outcomes.jsonl"), metrics=metrics),
+        RecipeCache(),
+        semantic_cache=SemanticCache(threshold=threshold),
+        metrics=metrics,
+        history=RecipeHistory(),
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate recipes for a JSONL file of requests.")
+    parser.add_argument("requests", help="JSONL file, one request per line")
+    parser.add_argument("-o", "--output", required=True, help="JSONL results; also the resume checkpoint")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once (default 4)")
+    parser.add_argument("--rpm", type=int, help="requests per minute per model (default: free-tier quota)")
+    parser.add_argument("--tpm", type=int, help="tokens per minute per model (default: free-tier quota)")
+    parser.add_argument("--budget", type=int, default=DEFAULT_INPUT_BUDGET, help="input-token budget per prompt")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="similar-request threshold")
+    parser.add_argument("--refresh", action="store_true", help="call the model even when a cached answer exists")
+    parser.add_argument("--history", action="store_true", help="also reuse recipes from the history (up to 30 days old)")
+    parser.add_argument("--api-key", default=os.environ.get("GEMINI_API_KEY", ""), help="default: $GEMINI_API_KEY")
+    parser.add_argument("-q", "--quiet", action="store_true", help="no per-request progress on stderr")
+    args = parser.parse_args(argv)
+    if not args.api_key:
+        parser.error("no API key: pass --api-key or set GEMINI_API_KEY")
+
+    def log(message):
+        if not args.quiet:
+            print(message, file=sys.stderr, flush=True)
+
+    done = completed_ids(args.output)
+    if done:
+        log(f"Resuming: {len(done)} requests already done in {args.output}")
+    service = build_service(args.api_key, args.rpm, args.tpm, args.threshold)
+    started = time.perf_counter()
+    torn = ends_mid_line(args.output)
+    with open(args.output, "a", encoding="utf-8") as out:
+        if torn:
+            # Start on a fresh line if the previous run died mid-write
+            out.write("\n")
+        counts = run_batch(
+            service, read_requests(args.requests), out, max(1, args.concurrency),
+            budget=args.budget, refresh=args.refresh, done=done, log=log, use_history=args.history,
+        )
+    summary = ", ".join(f"{count} {outcome}" for outcome, count in counts.items() if count)
+    print(f"Finished in {time.perf_counter() - started:.1f}s: {summary or 'nothing to do'}", file=sys.stderr)
+    return 1 if counts["error"] or counts["invalid"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,217 @@
+"""Local stand-in for ``google.generativeai`` so the app can be benchmarked offline.
+
+``install()`` puts this module in ``sys.modules`` under
+``google.generativeai``; every later ``import google.generativeai as genai``
+(app.py, batch.py) gets the fake. Each model's behaviour comes from a
+``ModelProfile``: a lognormal time to first token, a streaming rate in
+tokens per second, an output size per recipe and rates of injected 429
+and 500 errors. Responses are valid recipe JSON with as many recipes as
+the prompt asks for, so the whole parse/render path runs.
+
+    import fake_genai
+    fake_genai.install({"gemini-1.5-flash": {"first_token": 0.4, "tokens_per_second": 200, "error_429": 0.05}})
+"""
+
+import json
+import math
+import random
+import re
+import sys
+import threading
+import time
+import types
+
+try:
+    from google.api_core.exceptions import InternalServerError, ResourceExhausted
+except ImportError:
+    class ResourceExhausted(Exception):
+        code = 429
+
+    class InternalServerError(Exception):
+        code = 500
+
+RECIPE_COUNT = re.compile(r"Create exactly (\d+)")
+CHARS_PER_TOKEN = 4
+# Tokens per streamed chunk; the real API sends a few dozen characters at a time
+CHUNK_TOKENS = 8
+
+
+class ModelProfile:
+    def __init__(self, first_token=0.5, first_token_sigma=0.3, tokens_per_second=150.0, tokens_per_recipe=600,
+                 error_429=0.0, error_500=0.0):
+        # Median seconds to the first token; sigma spreads it lognormally to give a realistic tail
+        self.first_token = first_token
+        self.first_token_sigma = first_token_sigma
+        self.tokens_per_second = tokens_per_second
+        self.tokens_per_recipe = tokens_per_recipe
+        self.error_429 = error_429
+        self.error_500 = error_500
+
+    def sample_first_token(self, rng):
+        if self.first_token <= 0:
+            return 0.0
+        return self.first_token * math.exp(rng.gauss(0, self.first_token_sigma))
+
+
+DEFAULT_PROFILES = {
+    "gemini-1.5-flash": ModelProfile(first_token=0.4, tokens_per_second=200),
+    "gemini-1.5-pro": ModelProfile(first_token=1.2, tokens_per_second=80),
+}
+
+profiles = dict(DEFAULT_PROFILES)
+stats = {"calls": 0, "errors_429": 0, "errors_500": 0, "count_tokens": 0}
+_lock = threading.Lock()
+_rng = random.Random(0)
+
+
+def set_profiles(overrides=None, seed=0):
+    """Replace the model profiles: ``{model: {ModelProfile field: value}}`` on top of the defaults."""
+    global _rng
+    profiles.clear()
+    profiles.update(DEFAULT_PROFILES)
+    for model, fields in (overrides or {}).items():
+        base = vars(profiles.get(model, ModelProfile()))
+        profiles[model] = ModelProfile(**dict(base, **fields))
+    _rng = random.Random(seed)
+    for key in stats:
+        stats[key] = 0
+
+
+def _count(key):
+    with _lock:
+        stats[key] += 1
+
+
+def fake_recipes(count, tokens_per_recipe, seed=""):
+    """Recipe JSON for ``count`` recipes, padded to roughly ``tokens_per_recipe`` tokens each."""
+    recipes = []
+    for idx in range(count):
+        recipe = {
+            "name": f"Benchmark Dish {idx + 1} {seed}".strip(),
+            "description": "A stand-in recipe produced by the local benchmark model.",
+            "prep_time": "10 min",
+            "cook_time": "20 min",
+            "servings": 2,
+            "ingredients": [{"name": "benchmark stock", "quantity": 1.5, "unit": "cups"}],
+            "steps": [],
+            "tips": ["Season to taste."],
+            "nutrition": {"calories": 450, "protein_g": 30, "carbs_g": 40, "fat_g": 15, "highlights": "Balanced"},
+        }
+        step = 0
+        while len(json.dumps(recipe)) < tokens_per_recipe * CHARS_PER_TOKEN:
+            step += 1
+            recipe["steps"].append(f"Step {step}: stir the pan gently and let everything simmer for a minute.")
+        recipes.append(recipe)
+    return json.dumps({"recipes": recipes})
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _Response:
+    def __init__(self, text, prompt_tokens, profile, first_token):
+        self.text = text
+        self._profile = profile
+        self._first_token = first_token
+        self.usage_metadata = types.SimpleNamespace(
+            prompt_token_count=prompt_tokens,
+            candidates_token_count=math.ceil(len(text) / CHARS_PER_TOKEN),
+            total_token_count=prompt_tokens + math.ceil(len(text) / CHARS_PER_TOKEN),
+        )
+
+    def __iter__(self):
+        time.sleep(self._first_token)
+        step = CHUNK_TOKENS * CHARS_PER_TOKEN
+        delay = CHUNK_TOKENS / self._profile.tokens_per_second if self._profile.tokens_per_second else 0.0
+        for start in range(0, len(self.text), step):
+            if start:
+                time.sleep(delay)
+            yield _Chunk(self.text[start:start + step])
+
+    def resolve(self):
+        pass
+
+
+class GenerativeModel:
+    def __init__(self, model_name, generation_config=None, **kwargs):
+        self.model_name = model_name
+        self.generation_config = generation_config
+
+    def _profile(self):
+        return profiles.get(self.model_name) or ModelProfile()
+
+    def generate_content(self, prompt, generation_config=None, stream=False, **kwargs):
+        _count("calls")
+        profile = self._profile()
+        with _lock:
+            roll = _rng.random()
+            first_token = profile.sample_first_token(_rng)
+        if roll < profile.error_429:
+            _count("errors_429")
+            time.sleep(first_token / 4)
+            raise ResourceExhausted("429 Resource has been exhausted (e.g. check quota).")
+        if roll < profile.error_429 + profile.error_500:
+            _count("errors_500")
+            time.sleep(first_token / 2)
+            raise InternalServerError("500 An internal error has occurred.")
+
+        match = RECIPE_COUNT.search(str(prompt))
+        text = fake_recipes(int(match.group(1)) if match else 1, profile.tokens_per_recipe, self.model_name)
+        response = _Response(text, math.ceil(len(str(prompt)) / CHARS_PER_TOKEN), profile, first_token)
+        if stream:
+            return response
+        # Non-streaming calls return once the whole response has been "written"
+        rate = profile.tokens_per_second
+        time.sleep(first_token + (response.usage_metadata.candidates_token_count / rate if rate else 0.0))
+        return response
+
+    def start_chat(self, history=None):
+        return ChatSession(self, history)
+
+    def count_tokens(self, contents):
+        _count("count_tokens")
+        return types.SimpleNamespace(total_tokens=math.ceil(len(str(contents)) / CHARS_PER_TOKEN))
+
+
+class ChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, generation_config=None, stream=False, **kwargs):
+        # Like the real SDK, every message resends the whole history
+        prompt = json.dumps(self.history) + str(content)
+        response = self.model.generate_content(prompt, generation_config=generation_config, stream=stream)
+        self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": [response.text]}]
+        return response
+
+
+def configure(api_key=None, **kwargs):
+    pass
+
+
+class _ClientManager:
+    # Per-key service clients; the fake models make no calls through them
+    def configure(self, api_key=None, **kwargs):
+        self.api_key = api_key
+
+    def get_default_client(self, name):
+        return None
+
+
+client = types.SimpleNamespace(_ClientManager=_ClientManager)
+
+
+def install(overrides=None, seed=0):
+    """Make ``import google.generativeai`` return this module from now on."""
+    set_profiles(overrides, seed)
+    module = sys.modules[__name__]
+    google = sys.modules.get("google")
+    if google is None:
+        google = sys.modules["google"] = types.ModuleType("google")
+        google.__path__ = []
+    sys.modules["google.generativeai"] = module
+    google.generativeai = module
+    return module
@@ -0,0 +1,304 @@
+"""Offline performance and load benchmark for app.py against a local Gemini stand-in.
+
+Nothing leaves the machine: ``fake_genai`` replaces ``google.generativeai``
+with models whose first-token latency, streaming rate and 429/500 error
+rates are configurable. Sessions are driven through
+``streamlit.testing.v1.AppTest`` exactly as a user would: add ingredients,
+click Generate, rerun until the background job has been collected.
+
+    python benchmarks/load_benchmark.py                                 # one session: reruns, generations, memory
+    python benchmarks/load_benchmark.py --sessions 8 --generations 5    # concurrent sessions: throughput, tail latency
+    python benchmarks/load_benchmark.py --error-429 0.2 --error-500 0.1 # fallback behaviour under injected errors
+    python benchmarks/load_benchmark.py --profiles profiles.json --json # per-model profiles, machine-readable output
+
+``--profiles`` takes ``{"gemini-1.5-flash": {"first_token": 0.4, "tokens_per_second": 200,
+"error_429": 0.05}}`` (fields of ``fake_genai.ModelProfile``). Every run uses
+a fresh cache directory; the semantic cache and library-first serving are
+off and each generation uses a new ingredient, so every click reaches the
+model. Latency is measured from the click to the recipes on screen, at the
+``--poll`` resolution.
+
+In load mode the sessions' script runs take turns (AppTest is not
+thread-safe), much as script threads share the GIL in a real server; the
+generation jobs behind them run concurrently. Rerun times exclude the wait
+for a turn, generation latency includes it.
+"""
+
+import argparse
+import gc
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import uuid
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+APP_PATH = os.path.join(REPO_DIR, "app.py")
+sys.path[:0] = [BENCH_DIR, REPO_DIR]
+
+import fake_genai  # noqa: E402
+from fallback_policy import percentile  # noqa: E402
+
+SEED_INGREDIENTS = ["Chicken", "Rice", "Garlic", "Onions", "Tomatoes", "Spinach", "Eggs", "Cheese"]
+# Rate limits high enough that the local gateway only queues when --rpm asks it to
+UNLIMITED = {"rpm": 1_000_000, "tpm": 1_000_000_000}
+# AppTest swaps process globals (the Runtime instance, st.secrets) for the length of each run,
+# so script runs take turns; generation jobs, the gateway and the caches stay fully concurrent
+SCRIPT_LOCK = threading.Lock()
+
+
+def summarize(values):
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": statistics.mean(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values),
+    }
+
+
+class Session:
+    """One simulated browser session on app.py."""
+
+    def __init__(self, args):
+        from streamlit.testing.v1 import AppTest
+
+        self.args = args
+        self.rerun_seconds = []
+        # Secrets come from install_secrets(): per-AppTest secrets swap st.secrets on every run,
+        # which concurrent sessions would trample
+        self.at = AppTest.from_file(APP_PATH, default_timeout=120)
+        self.run()
+        self.at.toggle(key="library_first").set_value(False)
+        self.at.toggle(key="stream_output").set_value(args.stream)
+        self.run()
+        self.at.text_area[0].input("\n".join(SEED_INGREDIENTS[:args.ingredients]))
+        self.at.button(key="add_multiple").click()
+        self.run()
+        self.at.slider[0].set_value(args.recipes)
+        self.run()
+
+    def run(self):
+        with SCRIPT_LOCK:
+            start = time.perf_counter()
+            self.at.run()
+            self.rerun_seconds.append(time.perf_counter() - start)
+        if self.at.exception:
+            raise RuntimeError(f"app raised: {[e.value for e in self.at.exception]}")
+
+    def generate(self):
+        """Add a never-seen ingredient, click Generate and wait for the result: ``(seconds, outcome)``."""
+        self.at.text_input[0].input(f"bench{uuid.uuid4().hex[:10]}")
+        self.at.button(key="add_single").click()
+        self.run()
+        start = time.perf_counter()
+        [button for button in self.at.button if "Generate" in button.label][0].click()
+        self.run()
+        deadline = start + self.args.timeout
+        while self.at.session_state["job_id"] is not None:
+            if time.perf_counter() > deadline:
+                return time.perf_counter() - start, "timeout"
+            time.sleep(self.args.poll)
+            self.run()
+        return time.perf_counter() - start, self.outcome()
+
+    def outcome(self):
+        messages = [e.value for e in self.at.success]
+        if any("generated successfully" in m for m in messages):
+            return "ok"
+        if any("Success with" in m for m in messages):
+            return "fallback"
+        if self.at.warning:
+            return "library_fallback"
+        return "error"
+
+
+def install_secrets(args):
+    import streamlit as st
+    from streamlit.runtime.secrets import Secrets
+
+    rpm = args.rpm or UNLIMITED["rpm"]
+    secrets = Secrets()
+    secrets._secrets = {
+        "GEMINI_API_KEY": "benchmark-key",
+        # Nothing but the exact-match cache in front of the model
+        "SEMANTIC_CACHE_THRESHOLD": 1.01,
+        "GEMINI_RATE_LIMITS": {model: {"rpm": rpm, "tpm": UNLIMITED["tpm"]} for model in fake_genai.DEFAULT_PROFILES},
+    }
+    st.secrets = secrets
+
+
+def measure_reruns(session, runs):
+    # Idle reruns: what any widget interaction outside a fragment costs
+    session.rerun_seconds.clear()
+    for _ in range(runs):
+        session.run()
+    return summarize(session.rerun_seconds)
+
+
+def measure_memory(args):
+    """Traced Python heap growth per additional session that has generated once."""
+    warm = Session(args)
+    warm.generate()
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    sessions = []
+    for _ in range(args.memory_sessions):
+        session = Session(args)
+        session.generate()
+        sessions.append(session)
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {"sessions": len(sessions), "bytes_per_session": (after - before) / len(sessions)}
+
+
+def run_single(args):
+    session = Session(args)
+    reruns = measure_reruns(session, args.runs)
+    latencies, outcomes = [], {}
+    for _ in range(args.generations):
+        seconds, outcome = session.generate()
+        latencies.append(seconds)
+        outcomes[outcome] = outcomes.get(outcome, 0) + 1
+    result = {
+        "mode": "single",
+        "rerun_seconds": reruns,
+        "generation_seconds": summarize(latencies),
+        "outcomes": outcomes,
+    }
+    if args.memory_sessions:
+        result["memory"] = measure_memory(args)
+    return result
+
+
+def run_load(args):
+    latencies, outcomes, reruns, failures = [], {}, [], []
+    lock = threading.Lock()
+    # Sessions load one at a time; the clock starts once all are on screen
+    sessions = [Session(args) for _ in range(args.sessions)]
+
+    def user(session):
+        try:
+            session.rerun_seconds.clear()
+            for _ in range(args.generations):
+                seconds, outcome = session.generate()
+                with lock:
+                    latencies.append(seconds)
+                    outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        except Exception as e:
+            with lock:
+                failures.append(f"{type(e).__name__}: {e}")
+        with lock:
+            reruns.extend(session.rerun_seconds)
+
+    threads = [threading.Thread(target=user, args=(s,), name=f"session-{idx}") for idx, s in enumerate(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    completed = sum(count for outcome, count in outcomes.items() if outcome != "timeout")
+    return {
+        "mode": "load",
+        "sessions": args.sessions,
+        "wall_seconds": wall,
+        "throughput_per_second": completed / wall if wall else 0.0,
+        "generation_seconds": summarize(latencies),
+        "rerun_seconds": summarize(reruns),
+        "outcomes": outcomes,
+        "session_failures": failures,
+    }
+
+
+def ms(value):
+    return "-" if value is None else f"{value * 1000:.0f}"
+
+
+def print_report(result):
+    print(f"== {result['mode']} run against {APP_PATH}")
+    if result["mode"] == "load":
+        print(f"   sessions            {result['sessions']}")
+        print(f"   wall time           {result['wall_seconds']:.1f} s")
+        print(f"   throughput          {result['throughput_per_second']:.2f} generations/s")
+    for label, key in (("rerun", "rerun_seconds"), ("generation", "generation_seconds")):
+        s = result[key]
+        if s["count"]:
+            print(f"   {label:<10} ms      p50 {ms(s['p50'])} · p95 {ms(s['p95'])} · p99 {ms(s['p99'])}"
+                  f" · max {ms(s['max'])} (n={s['count']})")
+    print(f"   outcomes            {', '.join(f'{k} {v}' for k, v in sorted(result['outcomes'].items())) or 'none'}")
+    print(f"   model calls         {result['fake']['calls']} ({result['fake']['errors_429']} x 429,"
+          f" {result['fake']['errors_500']} x 500 injected)")
+    if "memory" in result:
+        print(f"   memory per session  {result['memory']['bytes_per_session'] / 1024:.0f} KiB"
+              f" (traced, {result['memory']['sessions']} sessions)")
+    for failure in result.get("session_failures", []):
+        print(f"   session failed: {failure}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=1, help="concurrent sessions; more than 1 runs the load mode")
+    parser.add_argument("--generations", type=int, default=3, help="Generate clicks per session")
+    parser.add_argument("--recipes", type=int, default=2, help="recipes per generation")
+    parser.add_argument("--ingredients", type=int, default=6, help="pantry size to seed")
+    parser.add_argument("--runs", type=int, default=10, help="idle reruns to time (single-session mode)")
+    parser.add_argument("--memory-sessions", type=int, default=3, help="extra sessions for the memory measurement (0: skip)")
+    parser.add_argument("--no-stream", dest="stream", action="store_false", help="turn off streamed output")
+    parser.add_argument("--first-token", type=float, help="median seconds to first token, every model")
+    parser.add_argument("--tokens-per-second", type=float, help="streaming rate, every model")
+    parser.add_argument("--error-429", type=float, default=0.0, help="share of calls failing with 429 on the first model")
+    parser.add_argument("--error-500", type=float, default=0.0, help="share of calls failing with 500 on the first model")
+    parser.add_argument("--profiles", help="JSON file of per-model fake_genai.ModelProfile fields")
+    parser.add_argument("--rpm", type=int, help="requests per minute for the app's rate-limit gateway")
+    parser.add_argument("--poll", type=float, default=0.05, help="seconds between reruns while a job runs")
+    parser.add_argument("--timeout", type=float, default=120.0, help="give up on a generation after this long")
+    parser.add_argument("--seed", type=int, default=0, help="seed for sampled latencies and injected errors")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args()
+
+    overrides = {}
+    if args.profiles:
+        with open(args.profiles, encoding="utf-8") as f:
+            overrides = json.load(f)
+    for model in fake_genai.DEFAULT_PROFILES:
+        fields = overrides.setdefault(model, {})
+        if args.first_token is not None:
+            fields.setdefault("first_token", args.first_token)
+        if args.tokens_per_second is not None:
+            fields.setdefault("tokens_per_second", args.tokens_per_second)
+    # Errors go to the default (first) model so the fallback path is exercised
+    first_model = next(iter(fake_genai.DEFAULT_PROFILES))
+    overrides[first_model].setdefault("error_429", args.error_429)
+    overrides[first_model].setdefault("error_500", args.error_500)
+    fake_genai.install(overrides, seed=args.seed)
+    # The app's collapsed empty labels log a warning on every rerun
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        # Read by the app's modules when AppTest first imports them
+        os.environ["RECIPE_CACHE_DIR"] = cache_dir
+        os.environ.pop("RECIPE_LIBRARY_DIR", None)
+        install_secrets(args)
+        result = run_load(args) if args.sessions > 1 else run_single(args)
+    result["fake"] = dict(fake_genai.stats)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
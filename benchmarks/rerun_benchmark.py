@@ -0,0 +1,153 @@
+"""Measure what a Streamlit rerun of app.py costs: wall time and bytes sent to the browser.
+
+Every rerun is driven through ``streamlit.testing.v1.AppTest`` and the
+ForwardMsgs the script produces are serialized to count the bytes that
+would go over the websocket. Deltas emitted inside ``st.fragment``
+functions are also totalled per fragment, which is what a widget
+interaction inside that fragment sends once fragments are in use.
+
+    python benchmarks/rerun_benchmark.py                      # current tree
+    python benchmarks/rerun_benchmark.py --compare HEAD~1     # current tree vs a git revision
+    python benchmarks/rerun_benchmark.py --ingredients 200 --runs 30
+
+No API calls are made: reruns never reach generation.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_INGREDIENTS = [
+    "Chicken", "Rice", "Bell Peppers", "Onions", "Garlic", "Tomatoes", "Spinach", "Eggs",
+    "Cheese", "Pasta", "Broccoli", "Tofu", "Beef", "Shrimp", "Quinoa", "Yogurt",
+]
+
+
+def measure(app_path, ingredients, runs):
+    """Run inside a fresh interpreter: returns timing and byte statistics for ``app_path``."""
+    sys.path.insert(0, os.path.dirname(app_path))
+    from streamlit.testing.v1 import AppTest
+    from streamlit.testing.v1 import local_script_runner
+
+    captured = []
+    original_run = local_script_runner.LocalScriptRunner.run
+
+    def run_and_capture(self, *args, **kwargs):
+        tree = original_run(self, *args, **kwargs)
+        captured.append(list(self.forward_msgs()))
+        return tree
+
+    local_script_runner.LocalScriptRunner.run = run_and_capture
+
+    at = AppTest.from_file(app_path, default_timeout=60)
+    at.secrets["GEMINI_API_KEY"] = "benchmark-key"
+    start = time.perf_counter()
+    at.run()
+    cold = time.perf_counter() - start
+
+    # Seed the pantry through the UI so the scenario works for any app revision
+    items = [f"{SAMPLE_INGREDIENTS[i % len(SAMPLE_INGREDIENTS)]} {i // len(SAMPLE_INGREDIENTS) + 1}" for i in range(ingredients)]
+    at.text_area[0].input("\n".join(items))
+    at.button(key="add_multiple").click().run()
+
+    wall, sizes = [], []
+    fragment_bytes = {}
+    for _ in range(runs):
+        captured.clear()
+        start = time.perf_counter()
+        at.run()
+        wall.append(time.perf_counter() - start)
+        per_fragment = {}
+        total = 0
+        for msg in captured[-1]:
+            size = msg.ByteSize()
+            total += size
+            if msg.HasField("delta") and msg.delta.fragment_id:
+                per_fragment[msg.delta.fragment_id] = per_fragment.get(msg.delta.fragment_id, 0) + size
+        sizes.append(total)
+        fragment_bytes = per_fragment
+
+    return {
+        "app": app_path,
+        "ingredients": ingredients,
+        "runs": runs,
+        "exception": [str(e.value) for e in at.exception],
+        "cold_start_ms": cold * 1000,
+        "rerun_ms_p50": statistics.median(wall) * 1000,
+        "rerun_ms_p95": sorted(wall)[max(0, int(len(wall) * 0.95) - 1)] * 1000,
+        "rerun_bytes": statistics.mean(sizes),
+        "fragment_rerun_bytes": sorted(fragment_bytes.values(), reverse=True),
+    }
+
+
+def export_revision(ref, target):
+    archive = subprocess.run(["git", "archive", ref], cwd=REPO_DIR, check=True, capture_output=True).stdout
+    with tempfile.TemporaryFile() as f:
+        f.write(archive)
+        f.seek(0)
+        with tarfile.open(fileobj=f) as tar:
+            tar.extractall(target)
+    return os.path.join(target, "app.py")
+
+
+def run_isolated(app_path, ingredients, runs, cache_dir):
+    # Each revision gets its own interpreter so module and cache_resource state never leak across
+    env = dict(os.environ, RECIPE_CACHE_DIR=cache_dir)
+    out = subprocess.run(
+        [sys.executable, __file__, "--measure", app_path, "--ingredients", str(ingredients), "--runs", str(runs)],
+        check=True, capture_output=True, text=True, env=env,
+    ).stdout
+    return json.loads(out.strip().splitlines()[-1])
+
+
+def print_report(label, result):
+    print(f"== {label}: {result['app']}")
+    if result["exception"]:
+        print(f"   script raised: {result['exception']}")
+    print(f"   cold start        {result['cold_start_ms']:9.1f} ms")
+    print(f"   rerun p50 / p95   {result['rerun_ms_p50']:9.1f} / {result['rerun_ms_p95']:.1f} ms")
+    print(f"   bytes per rerun   {result['rerun_bytes']:9.0f}")
+    if result["fragment_rerun_bytes"]:
+        print(f"   fragment reruns   {', '.join(f'{b:.0f}' for b in result['fragment_rerun_bytes'])} bytes")
+    else:
+        print("   fragment reruns   none (every interaction reruns the whole script)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ingredients", type=int, default=50, help="pantry size to seed before measuring")
+    parser.add_argument("--runs", type=int, default=20, help="reruns to time")
+    parser.add_argument("--compare", metavar="GIT_REF", help="also measure app.py at this git revision")
+    parser.add_argument("--measure", metavar="APP", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(os.path.abspath(args.measure), args.ingredients, args.runs)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        if args.compare:
+            before = export_revision(args.compare, os.path.join(tmp, "before"))
+            results.append((f"before ({args.compare})", run_isolated(before, args.ingredients, args.runs, os.path.join(tmp, "cache-before"))))
+        results.append(("after (working tree)", run_isolated(os.path.join(REPO_DIR, "app.py"), args.ingredients, args.runs, os.path.join(tmp, "cache-after"))))
+
+    for label, result in results:
+        print_report(label, result)
+    if len(results) == 2:
+        (_, before), (_, after) = results
+        print(
+            f"== rerun time {after['rerun_ms_p50'] / before['rerun_ms_p50']:.2f}x, "
+            f"bytes per rerun {after['rerun_bytes'] / before['rerun_bytes']:.2f}x of before"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""Profile a cold start of app.py: import times and time to first render.
+
+Each run is a fresh interpreter started with ``-X importtime`` that loads
+app.py through ``streamlit.testing.v1.AppTest`` and runs it once, as the
+first visitor to a new container would. Reported per run (medians across
+``--runs``):
+
+- time to first render: process start to the end of the first script run,
+  and the script run alone;
+- where the Gemini SDK (``google.generativeai``) was imported: in front of
+  the first render, on the background warm-up thread, or not at all, and
+  how long after the first render it was ready;
+- the slowest top-level imports from the ``-X importtime`` breakdown.
+
+    python benchmarks/startup_profile.py                   # current tree
+    python benchmarks/startup_profile.py --compare HEAD~1  # current tree vs a git revision
+    python benchmarks/startup_profile.py --no-key          # a visitor without an API key
+
+The real SDK is imported when installed; no API calls complete (the key
+is fake, so warm-up fails in the background without affecting the run).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from rerun_benchmark import REPO_DIR, export_revision
+
+SDK = "google.generativeai"
+WARM_UP_THREAD = "client-warm-up"
+
+
+class ImportWatch:
+    """Meta path hook that notes when and on which thread a module is first imported."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = None
+        self.thread = None
+
+    def find_spec(self, name, path=None, target=None):
+        if name == self.name and self.started is None:
+            self.started = time.perf_counter()
+            self.thread = threading.current_thread().name
+        # Never finds anything itself; the regular finders do the import
+        return None
+
+
+def measure(app_path, with_key):
+    """Run inside a fresh interpreter: one cold first render of ``app_path``."""
+    started = time.perf_counter()
+    watch = ImportWatch(SDK)
+    sys.meta_path.insert(0, watch)
+    sys.path.insert(0, os.path.dirname(app_path))
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_ready = time.perf_counter()
+    at = AppTest.from_file(app_path, default_timeout=120)
+    if with_key:
+        at.secrets["GEMINI_API_KEY"] = "startup-profile-key"
+    at.run()
+    rendered = time.perf_counter()
+    rendered_at = time.time()
+
+    sdk = {"where": "not imported", "ready_after_render_ms": None}
+    if watch.started is not None:
+        sdk["where"] = "warm-up thread" if watch.thread == WARM_UP_THREAD else "before first render"
+        # Blocks until a background import has finished
+        __import__(SDK)
+        sdk["ready_after_render_ms"] = max(0.0, time.perf_counter() - rendered) * 1000
+    return {
+        "app": app_path,
+        "exception": [str(e.value) for e in at.exception],
+        "rendered_at": rendered_at,
+        "streamlit_import_ms": (streamlit_ready - started) * 1000,
+        "script_run_ms": (rendered - streamlit_ready) * 1000,
+        "sdk": sdk,
+    }
+
+
+def parse_importtime(stderr):
+    """``{module: cumulative microseconds}`` for the top-level imports in ``-X importtime`` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        # "import time:  self | cumulative |   name", the name indented two spaces per nesting level
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name[1:]
+        if not cumulative_us.strip().isdigit() or name.startswith(" "):
+            continue
+        modules[name] = modules.get(name, 0) + int(cumulative_us)
+    return modules
+
+
+def run_isolated(app_path, with_key, cache_dir):
+    # A new interpreter per run: nothing imported or cached survives from the last one
+    env = dict(os.environ, RECIPE_CACHE_DIR=cache_dir)
+    command = [sys.executable, "-X", "importtime", __file__, "--measure", app_path]
+    if not with_key:
+        command.append("--no-key")
+    spawned_at = time.time()
+    proc = subprocess.run(command, check=True, capture_output=True, text=True, env=env)
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result["first_render_ms"] = (result.pop("rendered_at") - spawned_at) * 1000
+    result["imports"] = parse_importtime(proc.stderr)
+    return result
+
+
+def profile(app_path, runs, with_key, cache_dir):
+    results = [run_isolated(app_path, with_key, os.path.join(cache_dir, str(idx))) for idx in range(runs)]
+
+    def median(key):
+        return statistics.median(result[key] for result in results)
+
+    ready = [r["sdk"]["ready_after_render_ms"] for r in results if r["sdk"]["ready_after_render_ms"] is not None]
+    modules = {name for result in results for name in result["imports"]}
+    imports = {name: statistics.median(r["imports"].get(name, 0) for r in results) / 1000 for name in modules}
+    return {
+        "app": app_path,
+        "runs": runs,
+        "exception": results[-1]["exception"],
+        "first_render_ms": median("first_render_ms"),
+        "streamlit_import_ms": median("streamlit_import_ms"),
+        "script_run_ms": median("script_run_ms"),
+        "sdk_where": sorted({r["sdk"]["where"] for r in results}),
+        "sdk_ready_after_render_ms": statistics.median(ready) if ready else None,
+        "import_ms": dict(sorted(imports.items(), key=lambda item: item[1], reverse=True)),
+    }
+
+
+def print_report(label, result, top):
+    print(f"== {label}: {result['app']} (median of {result['runs']} cold starts)")
+    if result["exception"]:
+        print(f"   script raised: {result['exception']}")
+    print(f"   time to first render  {result['first_render_ms']:8.0f} ms from process start")
+    print(f"     streamlit import    {result['streamlit_import_ms']:8.0f} ms")
+    print(f"     first script run    {result['script_run_ms']:8.0f} ms")
+    ready = result["sdk_ready_after_render_ms"]
+    print(f"   Gemini SDK            {', '.join(result['sdk_where'])}"
+          + ("" if ready is None else f"; ready {ready:.0f} ms after first render"))
+    print("   slowest imports (cumulative ms, -X importtime):")
+    for name, ms in list(result["import_ms"].items())[:top]:
+        print(f"     {ms:8.1f}  {name}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3, help="cold starts to take the median of")
+    parser.add_argument("--top", type=int, default=15, help="imports to list")
+    parser.add_argument("--no-key", dest="with_key", action="store_false", help="start without an API key")
+    parser.add_argument("--compare", metavar="GIT_REF", help="also profile app.py at this git revision")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    parser.add_argument("--measure", metavar="APP", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(os.path.abspath(args.measure), args.with_key)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = []
+        if args.compare:
+            before = export_revision(args.compare, os.path.join(tmp, "before"))
+            results.append((f"before ({args.compare})", profile(before, args.runs, args.with_key, os.path.join(tmp, "cache-before"))))
+        results.append(("after (working tree)", profile(os.path.join(REPO_DIR, "app.py"), args.runs, args.with_key, os.path.join(tmp, "cache-after"))))
+
+    if args.json:
+        print(json.dumps(dict(results), indent=2))
+        return
+    for label, result in results:
+        print_report(label, result, args.top)
+    if len(results) == 2:
+        (_, before), (_, after) = results
+        print(f"== time to first render {after['first_render_ms'] / before['first_render_ms']:.2f}x of before")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""Process-wide registry of preconfigured Gemini model clients.
+
+``genai.configure`` sets up one client per API service for the whole
+process, so it cannot serve two API keys: every model would call (and
+bill) whichever key was configured last. ``ClientRegistry`` instead builds
+the service clients for its own key (importing the SDK and its
+gRPC/protobuf stack on first use when built without it, so processes that
+never generate don't pay for the import), hands out one ``GenerativeModel``
+per (model name, generation_config) bound to them to every session, so all
+of a key's models share the same underlying HTTP/gRPC channel,
+warms the channel up in the background so the first Generate click does
+not pay for connection setup and the TLS handshake, and tracks each
+model's health from warm-up and real calls.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+
+class ClientHealth:
+    __slots__ = ("state", "calls", "failures", "last_error", "last_used", "warm_seconds")
+
+    def __init__(self):
+        # cold -> warming -> healthy/unhealthy; real calls keep it current afterwards
+        self.state = "cold"
+        self.calls = 0
+        self.failures = 0
+        self.last_error = ""
+        self.last_used = None
+        self.warm_seconds = None
+
+
+class ClientRegistry:
+    def __init__(self, genai, api_key, metrics=None):
+        # genai=None defers ``import google.generativeai`` to the first borrow
+        self._genai = genai
+        self._api_key = api_key
+        self.metrics = metrics
+        self._lock = threading.Lock()
+        self._sdk_lock = threading.Lock()
+        self._clients = {}
+        self._health = {}
+        self._service_clients = None
+        if genai is not None:
+            self._service_clients = self._configure(genai)
+
+    def _configure(self, genai):
+        # The SDK's own client factory, but private to this registry instead of process-wide
+        from google.generativeai import client as sdk_client
+
+        service_clients = sdk_client._ClientManager()
+        service_clients.configure(api_key=self._api_key)
+        return service_clients
+
+    def sdk(self):
+        """The SDK module, imported now if this is its first use."""
+        if self._genai is not None:
+            return self._genai
+        with self._sdk_lock:
+            if self._genai is None:
+                start = time.perf_counter()
+                import google.generativeai as genai
+
+                self._service_clients = self._configure(genai)
+                if self.metrics:
+                    self.metrics.observe("recipe_sdk_import_seconds", time.perf_counter() - start,
+                                         help="Import and configuration of the Gemini SDK")
+                self._genai = genai
+        return self._genai
+
+    def borrow(self, model_name, generation_config=None):
+        """Shared ``GenerativeModel`` for ``model_name`` and ``generation_config``, built on first use."""
+        key = (model_name, json.dumps(generation_config or {}, sort_keys=True))
+        # Outside the lock: a first-use import must not block health() and other borrowers
+        genai = self.sdk()
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                start = time.perf_counter()
+                client = genai.GenerativeModel(model_name, generation_config=generation_config)
+                # Bind the model to this key's service client; left unset it would use the process-wide default
+                client._client = self._service_clients.get_default_client("generative")
+                if self.metrics:
+                    self.metrics.observe(
+                        "recipe_model_construct_seconds", time.perf_counter() - start,
+                        help="GenerativeModel construction", model=model_name,
+                    )
+                self._clients[key] = client
+                self._health.setdefault(model_name, ClientHealth())
+            return client
+
+    @contextmanager
+    def track(self, model_name, ignore=()):
+        """Record the outcome of a call made with a borrowed client.
+
+        Exceptions in ``ignore`` (e.g. a cancelled hedge) say nothing about
+        the client and are re-raised without being counted.
+        """
+        health = self._health_for(model_name)
+        try:
+            yield
+        except ignore:
+            raise
+        except Exception as exc:
+            with self._lock:
+                health.calls += 1
+                health.failures += 1
+                health.last_error = str(exc)
+                health.last_used = time.time()
+                health.state = "unhealthy"
+            raise
+        with self._lock:
+            health.calls += 1
+            health.last_used = time.time()
+            health.state = "healthy"
+
+    def warm_up(self, model_names, background=True):
+        """Open the shared channel by counting tokens of a tiny prompt on each model."""
+        def run():
+            for model_name in model_names:
+                health = self._health_for(model_name)
+                with self._lock:
+                    health.state = "warming"
+                start = time.perf_counter()
+                try:
+                    self.borrow(model_name).count_tokens("warm up")
+                except Exception as exc:
+                    with self._lock:
+                        health.state = "unhealthy"
+                        health.last_error = str(exc)
+                    continue
+                with self._lock:
+                    health.warm_seconds = time.perf_counter() - start
+                    health.state = "healthy"
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name="client-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def health(self):
+        """``{model: {...}}`` snapshot of every model's health."""
+        with self._lock:
+            return {
+                model: {
+                    "state": h.state,
+                    "calls": h.calls,
+                    "failures": h.failures,
+                    "last_error": h.last_error,
+                    "last_used": h.last_used,
+                    "warm_seconds": h.warm_seconds,
+                }
+                for model, h in sorted(self._health.items())
+            }
+
+    def __len__(self):
+        return len(self._clients)
+
+    def _health_for(self, model_name):
+        with self._lock:
+            return self._health.setdefault(model_name, ClientHealth())
@@ -0,0 +1,325 @@
+"""Model fallback policy: hedged requests, retry backoff and circuit breakers.
+
+``FallbackPolicy.execute`` runs a generation attempt on the first healthy
+model in a worker thread. If a streamed attempt shows no progress (first
+token) within the hedge deadline, or any other attempt hasn't finished
+within the longer total-time deadline, the next model is started
+alongside it, and whichever one produces output first wins. Rate-limit and unavailable errors are retried
+with jittered exponential backoff, models that keep failing are skipped
+by their circuit breaker, and every outcome is recorded for tuning.
+"""
+
+import json
+import os
+import queue
+import random
+import threading
+import time
+from collections import deque
+
+RETRYABLE_CODES = {429, 503}
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures; half-open after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold=3, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self):
+        return self.state != "open"
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class OutcomeLog:
+    """Bounded in-memory record of attempt outcomes, optionally mirrored to a JSONL file.
+
+    With a ``metrics.Metrics`` instance, every outcome also feeds the
+    attempt counters and the time-to-first-token/total latency histograms.
+    """
+
+    def __init__(self, maxlen=2000, path=None, metrics=None):
+        self.entries = deque(maxlen=maxlen)
+        self.path = path
+        self.metrics = metrics
+        self._lock = threading.Lock()
+
+    def record(self, model, outcome, first_token=None, total=None, hedged=False, error=""):
+        entry = {
+            "ts": time.time(),
+            "model": model,
+            "outcome": outcome,
+            "first_token": first_token,
+            "total": total,
+            "hedged": hedged,
+            "error": error,
+        }
+        with self._lock:
+            self.entries.append(entry)
+            if self.path:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        if self.metrics:
+            self.metrics.inc("recipe_attempts_total", help="Generation attempts by outcome", model=model, outcome=outcome)
+            if hedged:
+                self.metrics.inc("recipe_hedged_attempts_total", help="Attempts started as hedges", model=model)
+            if outcome == "ok":
+                if first_token is not None:
+                    self.metrics.observe("recipe_first_token_seconds", first_token, help="Time to first token", model=model)
+                if total is not None:
+                    self.metrics.observe("recipe_generation_seconds", total, help="Total generation time", model=model)
+
+    def latencies(self, model, field="first_token"):
+        with self._lock:
+            return [e[field] for e in self.entries if e["model"] == model and e["outcome"] == "ok" and e[field] is not None]
+
+    def summary(self):
+        """Per-model attempt counts, error rate and p50/p95 latencies."""
+        with self._lock:
+            entries = list(self.entries)
+        summary = {}
+        for model in sorted({e["model"] for e in entries}):
+            rows = [e for e in entries if e["model"] == model]
+            ok = [e for e in rows if e["outcome"] == "ok"]
+            errors = [e for e in rows if e["outcome"] == "error"]
+            first = [e["first_token"] for e in ok if e["first_token"] is not None]
+            total = [e["total"] for e in ok if e["total"] is not None]
+            summary[model] = {
+                "attempts": len(rows),
+                "errors": len(errors),
+                "error_rate": len(errors) / len(rows) if rows else 0.0,
+                "first_token_p50": percentile(first, 50),
+                "first_token_p95": percentile(first, 95),
+                "total_p50": percentile(total, 50),
+                "total_p95": percentile(total, 95),
+            }
+        return summary
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+
+def is_retryable(exc):
+    """True for rate-limit (429) and service-unavailable (503) errors."""
+    code = getattr(exc, "code", None)
+    if isinstance(code, int) and code in RETRYABLE_CODES:
+        return True
+    text = str(exc)
+    return any(str(c) in text for c in RETRYABLE_CODES) or "Resource has been exhausted" in text
+
+
+def backoff_delay(attempt, base=1.0, cap=8.0):
+    """Full-jitter exponential backoff for retry number ``attempt`` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+class Cancelled(Exception):
+    """Raised inside a losing hedged attempt to stop consuming its stream."""
+
+
+class FallbackPolicy:
+    def __init__(
+        self,
+        hedge_deadline=6.0,
+        total_deadline=30.0,
+        min_samples=20,
+        max_retries=2,
+        backoff_base=1.0,
+        backoff_cap=8.0,
+        failure_threshold=3,
+        reset_timeout=60.0,
+        log_path=None,
+        metrics=None,
+    ):
+        self.hedge_deadline = hedge_deadline
+        self.total_deadline = total_deadline
+        self.min_samples = min_samples
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.outcomes = OutcomeLog(path=log_path, metrics=metrics)
+        self.breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, model):
+        with self._lock:
+            if model not in self.breakers:
+                self.breakers[model] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self.breakers[model]
+
+    def candidates(self, models):
+        """Models whose circuit allows a call, in order; all of them if every circuit is open."""
+        allowed = [m for m in models if self.breaker(m).allow()]
+        return allowed or list(models)
+
+    def deadline_for(self, model, streaming=True):
+        """Hedge deadline: the observed p95 time-to-first-token (or total time) once there is enough data."""
+        field, default = ("first_token", self.hedge_deadline) if streaming else ("total", self.total_deadline)
+        samples = self.outcomes.latencies(model, field)
+        if len(samples) >= self.min_samples:
+            return percentile(samples, 95)
+        return default
+
+    def execute(self, models, attempt, on_progress=None, on_reset=None, streaming=True):
+        """Run ``attempt(model, report)`` with hedging and fallback across ``models``.
+
+        ``attempt`` runs in a worker thread and calls ``report(item)`` for
+        each piece of progress (stream chunks, finished recipes, ...). Items
+        from the winning model are handed to ``on_progress`` on the calling
+        thread, so it is safe to update Streamlit elements there. If the
+        winner fails after emitting progress, ``on_reset()`` is called and
+        another model's output takes over from the start.
+
+        ``streaming`` says the attempt reports its first token early; attempts
+        that only report when done (or not at all) are hedged on total time
+        instead, and record no time to first token.
+
+        Returns ``(model, result)``; raises the last error if every model fails.
+        """
+        pending = self.candidates(models)
+        events = queue.Queue()
+        cancel = {}
+        buffers = {}
+        # Results of models that finished while another one was the winner
+        finished = {}
+        running = []
+        winner = None
+        last_error = None
+        hedge_at = None
+
+        def launch(model, hedged):
+            nonlocal hedge_at
+            cancel[model] = threading.Event()
+            buffers[model] = []
+            running.append(model)
+            hedge_at = time.monotonic() + self.deadline_for(model, streaming)
+            threading.Thread(
+                target=self._run_attempt,
+                args=(model, attempt, events, cancel[model], hedged, streaming),
+                daemon=True,
+            ).start()
+
+        while running or pending:
+            if not running:
+                launch(pending.pop(0), hedged=False)
+                continue
+            timeout = None
+            if pending and winner is None:
+                timeout = max(0.0, hedge_at - time.monotonic())
+            try:
+                kind, model, payload = events.get(timeout=timeout)
+            except queue.Empty:
+                # Nothing from the running model(s) yet: hedge with the next one
+                launch(pending.pop(0), hedged=True)
+                continue
+
+            if kind == "progress":
+                buffers[model].append(payload)
+                if winner is None:
+                    winner = model
+                if model == winner and on_progress:
+                    on_progress(payload)
+            elif kind == "done":
+                running.remove(model)
+                if winner in (None, model):
+                    for other in running:
+                        cancel[other].set()
+                    return model, payload
+                # Kept in case the winner fails before finishing
+                finished[model] = payload
+            elif kind == "error":
+                running.remove(model)
+                last_error = payload
+                if model == winner:
+                    winner = None
+                    if on_reset:
+                        on_reset()
+                    # A hedge that already finished wins outright
+                    for other, result in finished.items():
+                        for running_model in running:
+                            cancel[running_model].set()
+                        if on_progress:
+                            for item in buffers[other]:
+                                on_progress(item)
+                        return other, result
+                    # Hand over to a hedge that has already produced output
+                    for other in running:
+                        if buffers[other]:
+                            winner = other
+                            if on_progress:
+                                for item in buffers[other]:
+                                    on_progress(item)
+                            break
+
+        raise last_error if last_error else RuntimeError("No model available")
+
+    def _run_attempt(self, model, attempt, events, cancelled, hedged, streaming=True):
+        start = time.monotonic()
+        first_token = None
+        emitted = False
+
+        def report(item):
+            nonlocal first_token, emitted
+            if cancelled.is_set():
+                raise Cancelled()
+            # Progress of a non-streamed attempt (a finished recipe) is not a first token
+            if first_token is None and streaming:
+                first_token = time.monotonic() - start
+            emitted = True
+            events.put(("progress", model, item))
+
+        retry = 0
+        while True:
+            try:
+                result = attempt(model, report)
+            except Cancelled:
+                if not cancelled.is_set():
+                    # A shared upstream call was abandoned by another caller; make our own
+                    continue
+                self.outcomes.record(model, "cancelled", first_token, time.monotonic() - start, hedged)
+                return
+            except Exception as exc:
+                # Only retry before any output has been shown for this attempt
+                if is_retryable(exc) and not emitted and retry < self.max_retries and not cancelled.is_set():
+                    time.sleep(backoff_delay(retry, self.backoff_base, self.backoff_cap))
+                    retry += 1
+                    continue
+                self.breaker(model).record_failure()
+                self.outcomes.record(model, "error", first_token, time.monotonic() - start, hedged, str(exc))
+                events.put(("error", model, exc))
+                return
+            total = time.monotonic() - start
+            self.breaker(model).record_success()
+            self.outcomes.record(model, "ok", first_token, total, hedged)
+            events.put(("done", model, result))
+            return
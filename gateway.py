@@ -0,0 +1,178 @@
+"""Process-wide gateway in front of the Gemini API.
+
+Every Streamlit session shares one ``GenerationGateway`` (via
+``st.cache_resource``). It enforces per-model requests-per-minute and
+tokens-per-minute budgets with token buckets and coalesces identical
+in-flight calls so concurrent sessions asking for the same prompt share a
+single upstream request.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from concurrent.futures import Future
+
+from prompts import estimate_tokens as estimate_prompt_tokens
+
+# Free-tier quotas; override per deployment through GenerationGateway(limits=...)
+DEFAULT_LIMITS = {
+    "gemini-1.5-flash": {"rpm": 15, "tpm": 1_000_000},
+    "gemini-1.5-pro": {"rpm": 2, "tpm": 32_000},
+}
+FALLBACK_LIMITS = {"rpm": 10, "tpm": 250_000}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a call could not get its rate-limit budget in time."""
+
+    code = 429
+
+
+class TokenBucket:
+    """Continuously refilling bucket holding at most ``per_minute`` tokens."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, amount=1, timeout=None):
+        """Take ``amount`` tokens, waiting up to ``timeout`` seconds. Returns False on timeout."""
+        amount = min(float(amount), self.capacity)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return True
+                wait = (amount - self.tokens) / self.rate
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                self._cond.wait(wait)
+
+    def release(self, amount=1):
+        """Return unused tokens to the bucket."""
+        with self._cond:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens + amount)
+            self._cond.notify_all()
+
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result."""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """Return ``(result, shared)``; ``shared`` is True when another caller did the work."""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            return future.result(), True
+        try:
+            result = fn()
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+def call_key(model_name, prompt, generation_config):
+    payload = json.dumps([model_name, prompt, generation_config], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def estimate_tokens(prompt, generation_config):
+    """Rough TPM charge: the local prompt estimate plus the output budget."""
+    return estimate_prompt_tokens(prompt) + int(generation_config.get("max_output_tokens", 0))
+
+
+class GenerationGateway:
+    def __init__(self, limits=None, acquire_timeout=30.0):
+        # Overrides may set just rpm or tpm; the rest of that model's defaults still apply
+        self.limits = {model: dict(values) for model, values in DEFAULT_LIMITS.items()}
+        for model, values in (limits or {}).items():
+            self.limits[model] = dict(DEFAULT_LIMITS.get(model, FALLBACK_LIMITS), **values)
+        self.acquire_timeout = acquire_timeout
+        self.flights = SingleFlight()
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.in_flight = 0
+        self.calls = 0
+        self.coalesced = 0
+        self.throttled = 0
+
+    def _buckets_for(self, model_name):
+        with self._lock:
+            if model_name not in self._buckets:
+                limits = self.limits.get(model_name, FALLBACK_LIMITS)
+                self._buckets[model_name] = (TokenBucket(limits["rpm"]), TokenBucket(limits["tpm"]))
+            return self._buckets[model_name]
+
+    def _track(self, field, delta):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + delta)
+
+    def _admit(self, model_name, tokens):
+        requests, token_budget = self._buckets_for(model_name)
+        self._track("queued", 1)
+        try:
+            if not requests.acquire(1, self.acquire_timeout):
+                self._track("throttled", 1)
+                raise RateLimitExceeded(f"429 local rate limit: no request budget for {model_name}")
+            if not token_budget.acquire(tokens, self.acquire_timeout):
+                requests.release(1)
+                self._track("throttled", 1)
+                raise RateLimitExceeded(f"429 local rate limit: no token budget for {model_name}")
+        finally:
+            self._track("queued", -1)
+
+    def call(self, model_name, prompt, generation_config, fn):
+        """Run ``fn()`` (the upstream call for ``prompt``) under the model's budget, coalescing duplicates."""
+
+        def upstream():
+            self._admit(model_name, estimate_tokens(prompt, generation_config))
+            self._track("in_flight", 1)
+            self._track("calls", 1)
+            try:
+                return fn()
+            finally:
+                self._track("in_flight", -1)
+
+        result, shared = self.flights.do(call_key(model_name, prompt, generation_config), upstream)
+        if shared:
+            self._track("coalesced", 1)
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queued,
+                "in_flight": self.in_flight,
+                "calls": self.calls,
+                "coalesced": self.coalesced,
+                "throttled": self.throttled,
+            }
@@ -0,0 +1,58 @@
+"""Thin helpers around ``GenerativeModel.generate_content``."""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+def chunk_text(chunk):
+    """Text of a streamed chunk, or "" for chunks without text parts (e.g. the final finish chunk)."""
+    try:
+        return chunk.text or ""
+    except ValueError:
+        return ""
+
+
+def stream_text(response, on_chunk=None):
+    """Consume a ``stream=True`` response, passing each new piece of text to ``on_chunk``."""
+    parts = []
+    for chunk in response:
+        piece = chunk_text(chunk)
+        if not piece:
+            continue
+        parts.append(piece)
+        if on_chunk:
+            on_chunk(piece)
+    return "".join(parts)
+
+
+def generate_text(model, prompt, generation_config, stream=False, on_chunk=None, on_usage=None):
+    """Run ``prompt`` on ``model`` and return the full response text.
+
+    With ``stream=True`` chunks are consumed as they arrive and passed to
+    ``on_chunk`` so the caller can render partial output. ``on_usage``
+    receives the response's ``usage_metadata`` once the response is complete.
+    """
+    if not stream:
+        response = model.generate_content(prompt, generation_config=generation_config)
+        text = response.text
+    else:
+        response = model.generate_content(prompt, generation_config=generation_config, stream=True)
+        text = stream_text(response, on_chunk)
+    usage = getattr(response, "usage_metadata", None)
+    if on_usage and usage is not None:
+        on_usage(usage)
+    return text
+
+
+def generate_parallel(generate, prompts, max_workers=5):
+    """Run ``generate(prompt)`` for every prompt on a bounded thread pool.
+
+    Yields ``(index, text)`` pairs in completion order; pending requests are
+    cancelled if one of them fails.
+    """
+    pool = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {pool.submit(generate, prompt): idx for idx, prompt in enumerate(prompts)}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
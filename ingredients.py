@@ -0,0 +1,192 @@
+"""Ordered, de-duplicated ingredient set with canonical names.
+
+"Tomatoes", "tomato" and " Tomato " all canonicalize to ``"tomato"``, and
+synonyms such as "scallion" fold into one name ("green onion"). The
+canonical name doubles as the ingredient's stable id: membership, adding
+and removal are O(1) dict operations, and the sorted canonical names are
+what prompts and cache keys are built from. ``max_items`` caps the set:
+once full, further additions are ignored.
+"""
+
+import re
+from functools import lru_cache
+
+SYNONYMS = {
+    "scallion": "green onion",
+    "spring onion": "green onion",
+    "garbanzo bean": "chickpea",
+    "garbanzo": "chickpea",
+    "courgette": "zucchini",
+    "aubergine": "eggplant",
+    "capsicum": "bell pepper",
+    "sweet pepper": "bell pepper",
+    "prawn": "shrimp",
+    "coriander leaf": "cilantro",
+    "rocket": "arugula",
+    "minced beef": "ground beef",
+    "beef mince": "ground beef",
+    "icing sugar": "powdered sugar",
+    "confectioners sugar": "powdered sugar",
+    "corn flour": "cornstarch",
+    "cornflour": "cornstarch",
+    "chilli": "chili",
+    "chile": "chili",
+}
+
+IRREGULAR_PLURALS = {
+    "leaves": "leaf",
+    "loaves": "loaf",
+    "halves": "half",
+    "knives": "knife",
+    "cookies": "cookie",
+    "brownies": "brownie",
+    "veggies": "veggie",
+    "smoothies": "smoothie",
+    "chilies": "chili",
+    "chillies": "chili",
+    "chiles": "chili",
+}
+# Words that look plural but are not
+INVARIANT = {"molasses", "hummus", "couscous", "asparagus", "swiss", "grits", "series", "oats", "greens", "lentils"}
+
+SPLIT_PATTERN = re.compile(r"[,;\n]")
+PUNCTUATION = re.compile(r"[^\w\s'-]")
+
+
+def singularize(word):
+    if word in INVARIANT or len(word) <= 3:
+        return word
+    if word in IRREGULAR_PLURALS:
+        return IRREGULAR_PLURALS[word]
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith(("ches", "shes", "sses", "xes", "zes", "oes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=65536)
+def canonical_name(text):
+    """Casefold, strip punctuation, singularize the head noun and apply synonyms."""
+    words = PUNCTUATION.sub(" ", text.casefold()).split()
+    if not words:
+        return ""
+    words[-1] = singularize(words[-1])
+    name = " ".join(words)
+    return SYNONYMS.get(name, name)
+
+
+class IngredientSet:
+    """Insertion-ordered set of ingredients keyed by canonical name."""
+
+    __slots__ = ("_items", "_quantities", "max_items")
+
+    def __init__(self, names=(), max_items=None):
+        # canonical name -> display name (first spelling seen)
+        self._items = {}
+        # canonical name -> free-text quantity ("2 lb") for imported items
+        self._quantities = {}
+        self.max_items = max_items
+        self.extend(names)
+
+    @property
+    def full(self):
+        return self.max_items is not None and len(self._items) >= self.max_items
+
+    def add(self, name):
+        """Add ``name``; returns its canonical key, or None if it was blank, already present or the set is full."""
+        key = canonical_name(name)
+        if not key or key in self._items or self.full:
+            return None
+        self._items[key] = " ".join(name.split())
+        return key
+
+    def extend(self, names):
+        """Add many names at once, stopping when the set is full; returns how many were new."""
+        added = 0
+        items = self._items
+        for name in names:
+            if self.full:
+                break
+            key = canonical_name(name)
+            if key and key not in items:
+                items[key] = " ".join(name.split())
+                added += 1
+        return added
+
+    def import_items(self, items):
+        """Add ``(name, quantity)`` pairs, e.g. from ``pantry_import``; returns how many were new.
+
+        Quantities are only recorded for the first occurrence of an ingredient.
+        Stops reading ``items`` once the set is full.
+        """
+        added = 0
+        items_by_key = self._items
+        quantities = self._quantities
+        for name, quantity in items:
+            if self.full:
+                break
+            key = canonical_name(name)
+            if key and key not in items_by_key:
+                items_by_key[key] = " ".join(name.split())
+                if quantity:
+                    quantities[key] = quantity
+                added += 1
+        return added
+
+    def bulk_import(self, text):
+        """Add every ingredient in a pasted list split on newlines, commas or semicolons."""
+        return self.extend(part for part in SPLIT_PATTERN.split(text) if part.strip())
+
+    def remove(self, key):
+        """Remove by canonical key (the stable id); missing keys are ignored."""
+        self._items.pop(key, None)
+        self._quantities.pop(key, None)
+
+    def remove_many(self, keys):
+        """Remove several canonical keys in one update; returns how many were present."""
+        removed = 0
+        for key in keys:
+            if self._items.pop(key, None) is not None:
+                removed += 1
+            self._quantities.pop(key, None)
+        return removed
+
+    def clear(self):
+        self._items.clear()
+        self._quantities.clear()
+
+    def nbytes(self):
+        """Approximate payload size: the characters of every key, name and quantity."""
+        return sum(len(key) + len(name) for key, name in self._items.items()) + sum(
+            len(quantity) for quantity in self._quantities.values()
+        )
+
+    def quantity(self, key):
+        return self._quantities.get(key, "")
+
+    def __contains__(self, name):
+        return canonical_name(name) in self._items
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        return iter(self._items.values())
+
+    def __bool__(self):
+        return bool(self._items)
+
+    def items(self):
+        """``(key, display name)`` pairs in insertion order."""
+        return self._items.items()
+
+    def keys(self):
+        """Canonical names in insertion order."""
+        return list(self._items)
+
+    def canonical(self):
+        """Sorted canonical names; the stable form used for prompts and cache keys."""
+        return sorted(self._items)
@@ -0,0 +1,92 @@
+"""Background generation jobs that outlive Streamlit reruns.
+
+A rerun interrupts the script thread, so a generation started inside a
+button handler loses its result if the user touches any widget. Jobs run
+on a process-wide worker pool instead: the session keeps only the job id,
+polls the ``Job`` for progress and partial output, and collects the result
+whenever it next runs.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Job:
+    """State of one background job; workers update it, sessions read it."""
+
+    def __init__(self, job_id, label=""):
+        self.id = job_id
+        self.label = label
+        self.status = "queued"
+        # Whatever the worker wants to show before it finishes (e.g. recipes parsed so far)
+        self.partial = None
+        self.progress = None
+        self.result = None
+        self.error = ""
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed")
+
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.time()) - self.started
+
+
+class JobManager:
+    def __init__(self, max_workers=8, ttl_seconds=3600):
+        self.ttl_seconds = ttl_seconds
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="generation-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, label=""):
+        """Run ``fn(job, *args)`` on the pool; its return value becomes ``job.result``. Returns the job id."""
+        job = Job(uuid.uuid4().hex, label)
+        with self._lock:
+            self._reap()
+            self._jobs[job.id] = job
+        self._pool.submit(self._run, job, fn, args)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def pop(self, job_id):
+        """Forget a job once its session has collected the result."""
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def stats(self):
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            "queued": sum(job.status == "queued" for job in jobs),
+            "running": sum(job.status == "running" for job in jobs),
+            "finished": sum(job.done for job in jobs),
+        }
+
+    def _run(self, job, fn, args):
+        job.status = "running"
+        job.started = time.time()
+        try:
+            job.result = fn(job, *args)
+            job.status = "done"
+        except Exception as exc:
+            job.error = str(exc)
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    def _reap(self):
+        # Results nobody came back for (closed tabs) expire after ttl_seconds
+        cutoff = time.time() - self.ttl_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished < cutoff]:
+            del self._jobs[job_id]
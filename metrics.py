@@ -0,0 +1,181 @@
+"""Latency and token metrics for the generation path.
+
+``Metrics`` keeps Prometheus-style counters, gauges and histograms in memory, plus
+a bounded window of raw samples per series for p50/p95/p99. It can render
+the Prometheus text exposition format, mirror it to a ``.prom`` file for a
+node_exporter textfile collector, serve it over HTTP on a side port, and
+append one structured JSONL record per generation.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from fallback_policy import percentile
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+
+def _labels(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Metrics:
+    def __init__(self, log_path=None, prom_path=None, window=2000):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.window = window
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._counters = {}
+        self._gauges = {}
+        # (name, labels) -> [bucket counts, sum, count, recent samples]
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, amount=1, help="", **labels):
+        with self._lock:
+            self._help.setdefault(name, help)
+            key = (name, _labels(labels))
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def set(self, name, value, help="", **labels):
+        with self._lock:
+            self._help.setdefault(name, help)
+            self._gauges[(name, _labels(labels))] = value
+
+    def clear(self, name):
+        """Drop every series of gauge ``name``, so a republished set loses series that went away."""
+        with self._lock:
+            for key in [key for key in self._gauges if key[0] == name]:
+                del self._gauges[key]
+
+    def observe(self, name, value, help="", **labels):
+        with self._lock:
+            self._help.setdefault(name, help)
+            key = (name, _labels(labels))
+            series = self._histograms.get(key)
+            if series is None:
+                series = self._histograms[key] = [[0] * len(LATENCY_BUCKETS), 0.0, 0, deque(maxlen=self.window)]
+            for idx, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    series[0][idx] += 1
+            series[1] += value
+            series[2] += 1
+            series[3].append(value)
+
+    @contextmanager
+    def timer(self, name, help="", **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, help, **labels)
+
+    def percentiles(self, name, label="model"):
+        """``{label value: {"count", "p50", "p95", "p99"}}`` over the recent samples of histogram ``name``.
+
+        ``label=None`` pools every series of ``name`` under the key ``""``.
+        """
+        with self._lock:
+            groups = {}
+            for (series_name, labels), series in self._histograms.items():
+                if series_name == name:
+                    group = dict(labels).get(label, "") if label else ""
+                    groups.setdefault(group, []).extend(series[3])
+        return {
+            group: {
+                "count": len(values),
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+                "p99": percentile(values, 99),
+            }
+            for group, values in sorted(groups.items())
+        }
+
+    def counter_totals(self, name, label="model"):
+        with self._lock:
+            totals = {}
+            for (series_name, labels), value in self._counters.items():
+                if series_name == name:
+                    group = dict(labels).get(label, "")
+                    totals[group] = totals.get(group, 0) + value
+        return totals
+
+    def render_prometheus(self):
+        """All series in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {self._help.get(name) or name}", f"# TYPE {name} counter"]
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), value in sorted(self._gauges.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {self._help.get(name) or name}", f"# TYPE {name} gauge"]
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+            for (name, labels), (buckets, total, count, _) in sorted(self._histograms.items()):
+                if name not in seen:
+                    seen.add(name)
+                    lines += [f"# HELP {name} {self._help.get(name) or name}", f"# TYPE {name} histogram"]
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', str(bound))])} {bucket_count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+                lines.append(f"{name}_count{_format_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def log(self, record):
+        """Append one structured record to the JSONL log and refresh the ``.prom`` file."""
+        record = dict(record, ts=time.time())
+        if self.log_path:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        if self.prom_path:
+            # Write-then-rename so a scraper never reads a half-written file
+            tmp_path = self.prom_path + ".tmp"
+            with self._write_lock:
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    f.write(self.render_prometheus())
+                os.replace(tmp_path, self.prom_path)
+
+    def serve(self, port, host="0.0.0.0"):
+        """Expose ``/metrics`` on ``port`` from a daemon thread."""
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                found = self.path.split("?")[0] in ("/", "/metrics")
+                body = metrics.render_prometheus().encode("utf-8") if found else b""
+                self.send_response(200 if found else 404)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+        return server
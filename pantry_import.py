@@ -0,0 +1,213 @@
+"""Streaming parsers for pantry exports and grocery receipts.
+
+``iter_pantry_items`` reads an uploaded file incrementally and yields
+``PantryItem`` tuples, so tens of thousands of rows go straight into
+``IngredientSet.import_items`` without building intermediate lists.
+Supported inputs: CSV/TSV with a header row, JSON arrays (streamed element
+by element), JSON Lines, and plain text such as receipts or pasted lists.
+"""
+
+import csv
+import io
+import json
+import re
+from typing import NamedTuple
+
+NAME_COLUMNS = ("name", "ingredient", "item", "product", "description", "title")
+QUANTITY_COLUMNS = ("quantity", "qty", "amount", "count")
+UNIT_COLUMNS = ("unit", "units", "uom", "measure")
+
+UNITS = (
+    "x", "kg", "g", "gr", "mg", "lb", "lbs", "oz", "l", "ml", "cl", "dl", "pc", "pcs", "pk", "pack",
+    "packs", "ct", "can", "cans", "jar", "jars", "bag", "bags", "bunch", "bottle", "bottles",
+    "cup", "cups", "tbsp", "tsp", "dozen", "doz", "gal",
+)
+LEADING_QUANTITY = re.compile(
+    rf"^(?P<qty>\d{{1,3}}(?:[.,]\d+)?(?:/\d+)?)\s*(?P<unit>{'|'.join(UNITS)})?\.?\s+(?P<name>.+)$", re.IGNORECASE
+)
+TRAILING_QUANTITY = re.compile(
+    rf"^(?P<name>.+?)\s+(?P<qty>\d+(?:[.,]\d+)?)\s*(?P<unit>{'|'.join(UNITS)})\.?$", re.IGNORECASE
+)
+PRICE = re.compile(r"(?:[$€£]\s*)?-?\d+[.,]\d{2}\b\s*[A-Z]?$|@\s*[$€£]?\s*\d+[.,]\d{2}.*$")
+SKU = re.compile(r"\b\d{6,}\b")
+# Produce PLU codes lead receipt lines ("4011 BANANAS")
+PLU = re.compile(r"^\d{4,5}\s+")
+RECEIPT_NOISE = re.compile(
+    r"^(sub\s*total|total|tax|vat|change|cash|visa|mastercard|amex|debit|credit|card|balance|"
+    r"thank|receipt|store|cashier|tel|phone|date|time|savings|discount|coupon|items?\s+sold|"
+    r"\*+|-+|=+|#)",
+    re.IGNORECASE,
+)
+
+
+class PantryItem(NamedTuple):
+    name: str
+    quantity: str = ""
+
+
+def _pick(fields, candidates):
+    lowered = {f.strip().lower(): f for f in fields if f}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def _quantity(qty, unit):
+    qty = (qty or "").strip()
+    unit = (unit or "").strip()
+    if unit.lower() == "x":
+        unit = ""
+    return " ".join(part for part in (qty, unit) if part)
+
+
+def parse_line(line, receipt=False):
+    """Pull one ingredient (and an optional quantity) out of a free-text or receipt line.
+
+    With ``receipt=True`` only priced lines count, which skips store
+    headers, addresses and other unpriced receipt text.
+    """
+    text = line.strip().strip("-*•·").strip()
+    if not text or RECEIPT_NOISE.match(text):
+        return None
+    priced = PRICE.sub("", text)
+    if receipt and priced == text:
+        return None
+    text = PLU.sub("", SKU.sub(" ", priced).strip(" .,:;\t"))
+    if not text or not re.search(r"[^\W\d_]", text):
+        return None
+    quantity = ""
+    match = LEADING_QUANTITY.match(text) or TRAILING_QUANTITY.match(text)
+    if match:
+        quantity = _quantity(match.group("qty"), match.group("unit"))
+        text = match.group("name").strip(" .,:;")
+    if text.isupper():
+        # Receipts shout; keep display names readable
+        text = text.title()
+    return PantryItem(" ".join(text.split()), quantity)
+
+
+def iter_text(lines, receipt=False):
+    for line in lines:
+        if receipt:
+            item = parse_line(line, receipt=True)
+            if item:
+                yield item
+            continue
+        # A single pasted line may still hold several comma-separated items
+        for part in re.split(r"[,;]", line):
+            item = parse_line(part)
+            if item:
+                yield item
+
+
+def iter_csv(lines, delimiter=","):
+    reader = csv.reader(lines, delimiter=delimiter)
+    header = next(reader, None)
+    if header is None:
+        return
+    name_col = _pick(header, NAME_COLUMNS)
+    if name_col is None:
+        # No recognizable header: treat the first row as data, first column as the name
+        rows = [header]
+        name_idx, qty_idx, unit_idx = 0, None, None
+    else:
+        rows = []
+        name_idx = header.index(name_col)
+        qty_col = _pick(header, QUANTITY_COLUMNS)
+        unit_col = _pick(header, UNIT_COLUMNS)
+        qty_idx = header.index(qty_col) if qty_col else None
+        unit_idx = header.index(unit_col) if unit_col else None
+
+    def cell(row, idx):
+        return row[idx] if idx is not None and idx < len(row) else ""
+
+    for rows_iter in (rows, reader):
+        for row in rows_iter:
+            name = cell(row, name_idx).strip()
+            if name:
+                yield PantryItem(" ".join(name.split()), _quantity(cell(row, qty_idx), cell(row, unit_idx)))
+
+
+def _item_from_json(value):
+    if isinstance(value, str):
+        return parse_line(value)
+    if not isinstance(value, dict):
+        return None
+    name_key = _pick(value.keys(), NAME_COLUMNS)
+    if not name_key or not isinstance(value[name_key], str) or not value[name_key].strip():
+        return None
+    qty_key = _pick(value.keys(), QUANTITY_COLUMNS)
+    unit_key = _pick(value.keys(), UNIT_COLUMNS)
+    qty = value.get(qty_key) if qty_key else ""
+    unit = value.get(unit_key) if unit_key else ""
+    return PantryItem(" ".join(value[name_key].split()), _quantity(str(qty or ""), str(unit or "")))
+
+
+def iter_json_array(stream, chunk_size=65536):
+    """Yield elements of the first JSON array in ``stream`` one at a time."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    eof = False
+    while True:
+        if not eof and len(buffer) < chunk_size:
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+        if not started:
+            start = buffer.find("[")
+            if start == -1:
+                if eof:
+                    return
+                buffer = buffer[-1:]
+                continue
+            buffer = buffer[start + 1:]
+            started = True
+        buffer = buffer.lstrip(" \t\r\n,")
+        if buffer.startswith("]") or (eof and not buffer):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                # Truncated trailing element: keep what was parsed so far
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield value
+        buffer = buffer[end:]
+
+
+def iter_jsonl(lines):
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            continue
+
+
+def iter_pantry_items(fileobj, filename="", receipt=False):
+    """Stream ``PantryItem``s out of a binary file object; the format is picked from ``filename``.
+
+    ``receipt`` switches plain-text parsing to receipt mode (see ``parse_line``).
+    """
+    stream = io.TextIOWrapper(fileobj, encoding="utf-8-sig", errors="replace", newline="")
+    try:
+        name = filename.lower()
+        if name.endswith((".csv", ".tsv")):
+            yield from iter_csv(stream, delimiter="\t" if name.endswith(".tsv") else ",")
+        elif name.endswith((".jsonl", ".ndjson")):
+            yield from filter(None, map(_item_from_json, iter_jsonl(stream)))
+        elif name.endswith(".json"):
+            yield from filter(None, map(_item_from_json, iter_json_array(stream)))
+        else:
+            yield from iter_text(stream, receipt=receipt)
+    finally:
+        # Don't close the caller's file along with the wrapper
+        stream.detach()
@@ -0,0 +1,67 @@
+"""Sidebar option catalogs and helpers for turning selections into plain request values."""
+
+import hashlib
+import json
+
+from ingredients import canonical_name
+
+# Sidebar options; kept here so they are built once per process, not on every rerun
+MODEL_OPTIONS = {
+    "⚡ Gemini 1.5 Flash (Fast)": "gemini-1.5-flash",
+    "💎 Gemini 1.5 Pro (Advanced)": "gemini-1.5-pro",
+}
+TIME_OPTIONS = ["⚡ Under 15 min", "🏃 15-30 min", "🚶 30-45 min", "🪑 45-60 min", "🛋️ Over 1 hour"]
+DIFFICULTY_OPTIONS = ["👶 Easy", "👦 Medium", "👨 Hard", "🤷 Any"]
+DIETARY_OPTIONS = [
+    "🌱 Vegetarian", "🌿 Vegan", "🌾 Gluten-Free", "🥛 Dairy-Free",
+    "🥜 Nut-Free", "🥖 Low-Carb", "🥑 Keto",
+]
+CUISINE_OPTIONS = [
+    "🌐 Any", "🇮🇹 Italian", "🥢 Asian", "🌮 Mexican", "🇮🇳 Indian",
+    "🇬🇷 Mediterranean", "🇺🇸 American", "🇫🇷 French",
+]
+MEAL_OPTIONS = ["🍴 Any", "🌅 Breakfast", "☀️ Lunch", "🌙 Dinner", "🍿 Snack", "🍰 Dessert"]
+
+# Quick Add suggestions
+QUICK_ADD_CATEGORIES = {
+    "🥩 Proteins": ["Chicken", "Beef", "Fish", "Tofu", "Eggs", "Shrimp"],
+    "🥬 Vegetables": ["Tomatoes", "Onions", "Garlic", "Bell Peppers", "Broccoli", "Spinach"],
+    "🍚 Grains": ["Rice", "Pasta", "Quinoa", "Bread", "Couscous", "Noodles"],
+    "🧀 Dairy": ["Cheese", "Milk", "Butter", "Yogurt", "Cream", "Sour Cream"],
+}
+
+
+def clean_label(label):
+    """Strip the leading emoji from a sidebar option label ("🇮🇹 Italian" -> "Italian").
+
+    Plain values such as "30-45 min" (from batch request files) pass through unchanged.
+    """
+    parts = label.split(maxsplit=1)
+    if len(parts) == 2 and not any(ch.isalnum() for ch in parts[0]):
+        return parts[1]
+    return label.strip()
+
+
+def canonical_request(ingredients, time_pref, difficulty, dietary, cuisine, meal_type, model, recipe_count):
+    """Build the canonical form of a generation request.
+
+    Ingredients are canonicalized (casefolded, singularized, synonyms
+    merged), de-duplicated and sorted and the sidebar labels lose their
+    emoji, so equivalent requests compare equal.
+    """
+    return {
+        "ingredients": sorted({canonical_name(i) for i in ingredients} - {""}),
+        "time": clean_label(time_pref),
+        "difficulty": clean_label(difficulty),
+        "dietary": sorted(clean_label(d) for d in dietary),
+        "cuisine": clean_label(cuisine),
+        "meal": clean_label(meal_type),
+        "model": model,
+        "recipe_count": int(recipe_count),
+    }
+
+
+def request_key(request):
+    """Content-address a canonical request."""
+    payload = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
@@ -0,0 +1,164 @@
+"""Prompt text for recipe generation, compiled to fit a token budget.
+
+``compile_prompt`` builds the prompt without template indentation or empty
+requirement lines, estimates its input tokens locally (no API round trip),
+groups or trims very long ingredient lists to stay inside the input budget
+and sizes ``max_output_tokens`` for the number of recipes requested.
+``compile_refinement`` builds the much smaller prompt that patches a
+single recipe.
+"""
+
+import json
+import math
+from typing import NamedTuple
+
+from preferences import clean_label
+from recipe_model import SCHEMA_HINT
+
+# The schema is only read by the model, so send it without indentation
+COMPACT_SCHEMA = json.dumps(json.loads(SCHEMA_HINT), separators=(",", ":"))
+
+# Input budget for a whole prompt; st.secrets PROMPT_TOKEN_BUDGET overrides it
+DEFAULT_INPUT_BUDGET = 1200
+# One JSON recipe runs 500-800 tokens; the base covers the wrapper object
+OUTPUT_TOKENS_BASE = 200
+OUTPUT_TOKENS_PER_RECIPE = 900
+MAX_OUTPUT_TOKENS = 8192
+
+# Steer parallel one-recipe requests apart since they cannot see each other
+DISTINCT_ANGLES = [
+    "a quick, weeknight-friendly dish",
+    "a comforting, classic-style dish",
+    "a fresh and light dish",
+    "a bold, well-spiced dish",
+    "a creative dish that would impress guests",
+]
+
+
+def variation_hint(index, total):
+    """Distinctness hint for recipe ``index`` (0-based) of ``total`` generated in parallel."""
+    angle = DISTINCT_ANGLES[index % len(DISTINCT_ANGLES)]
+    return f"This is recipe {index + 1} of {total} being created separately; make it {angle} so it differs from the others."
+
+
+def estimate_tokens(text):
+    """Local token estimate, about 4 characters per token for Gemini on English text."""
+    return math.ceil(len(text) / 4)
+
+
+def output_budget(recipe_count):
+    """``max_output_tokens`` for ``recipe_count`` recipes, so the last one is not cut off."""
+    return min(MAX_OUTPUT_TOKENS, OUTPUT_TOKENS_BASE + OUTPUT_TOKENS_PER_RECIPE * recipe_count)
+
+
+def group_ingredients(ingredients):
+    """Fold names sharing a head noun: "cheddar cheese", "feta cheese" -> "cheese (cheddar, feta)"."""
+    groups = {}
+    for name in ingredients:
+        head, _, modifier = name.rpartition(" ")
+        groups.setdefault(modifier if head else name, []).append(head)
+    grouped = []
+    for noun, modifiers in groups.items():
+        kinds = [m for m in modifiers if m]
+        if len(kinds) < 2:
+            grouped.extend(f"{m} {noun}" if m else noun for m in modifiers)
+        else:
+            if "" in modifiers:
+                kinds.insert(0, "plain")
+            grouped.append(f"{noun} ({', '.join(kinds)})")
+    return grouped
+
+
+def fit_ingredients(ingredients, budget):
+    """Return ``(listed, dropped)``: ingredient entries fitting ``budget`` tokens and how many names were left out.
+
+    Lists that fit are returned unchanged; longer ones are grouped first
+    and then cut at the budget, keeping the given order.
+    """
+    if estimate_tokens(", ".join(ingredients)) <= budget:
+        return list(ingredients), 0
+    grouped = group_ingredients(ingredients)
+    listed, used = [], 0
+    for entry in grouped:
+        cost = estimate_tokens(entry) + 1
+        if used + cost > budget:
+            break
+        listed.append(entry)
+        used += cost
+    # Grouped entries stand for several names; count what was dropped in names
+    kept_names = sum(entry.count(",") + 1 if entry.endswith(")") else 1 for entry in listed)
+    return listed, max(0, len(ingredients) - kept_names)
+
+
+class CompiledPrompt(NamedTuple):
+    text: str
+    input_tokens: int
+    max_output_tokens: int
+    ingredients_listed: int
+    ingredients_dropped: int
+
+
+def build_prompt(ingredients, recipe_count, time_pref, difficulty, dietary, cuisine, meal_type, hint=""):
+    """Build the generation prompt from the ingredient list and raw sidebar labels."""
+    clean_time = clean_label(time_pref)
+    clean_difficulty = clean_label(difficulty)
+    clean_dietary = [clean_label(d) for d in dietary]
+    clean_cuisine = clean_label(cuisine)
+    clean_meal = clean_label(meal_type)
+
+    dietary_text = f"Dietary restrictions: {', '.join(clean_dietary)}" if clean_dietary else "No dietary restrictions"
+    recipes_word = "recipe" if recipe_count == 1 else "recipes"
+
+    requirements = [
+        f"- Cooking time: {clean_time}",
+        f"- Difficulty level: {clean_difficulty}",
+        f"- {dietary_text}",
+    ]
+    if clean_cuisine != "Any":
+        requirements.append(f"- Cuisine preference: {clean_cuisine}")
+    if clean_meal != "Any":
+        requirements.append(f"- Meal type: {clean_meal}")
+    if hint:
+        requirements.append(f"- {hint}")
+
+    return "\n".join([
+        f"Create exactly {recipe_count} unique and detailed {recipes_word} using these ingredients: {', '.join(ingredients)}",
+        "Requirements:",
+        *requirements,
+        "For each recipe, provide:",
+        "1. Recipe Name (creative and appealing)",
+        "2. Brief Description (2-3 sentences)",
+        "3. Prep Time and Cook Time",
+        "4. Servings",
+        "5. Complete Ingredients List with numeric quantities and units",
+        "6. Step-by-step Instructions, one step per entry",
+        "7. Chef's Tips or Variations",
+        "8. Nutritional highlights (brief)",
+        f"Respond with JSON only, matching this shape: {COMPACT_SCHEMA}",
+        "Make the recipes practical, delicious, and easy to follow!",
+    ])
+
+
+def compile_prompt(ingredients, recipe_count, time_pref, difficulty, dietary, cuisine, meal_type, hint="",
+                   budget=DEFAULT_INPUT_BUDGET):
+    """Build the prompt within ``budget`` input tokens and pick its output budget."""
+    args = (recipe_count, time_pref, difficulty, dietary, cuisine, meal_type, hint)
+    overhead = estimate_tokens(build_prompt([], *args))
+    listed, dropped = fit_ingredients(ingredients, max(0, budget - overhead))
+    text = build_prompt(listed, *args)
+    return CompiledPrompt(text, estimate_tokens(text), output_budget(recipe_count), len(listed), dropped)
+
+
+def compile_refinement(instruction, recipe=None):
+    """Prompt for changing one recipe; ``recipe`` is omitted when the chat history already holds it."""
+    lines = []
+    if recipe is not None:
+        lines.append(f"Here is a recipe as JSON: {json.dumps(recipe.to_dict(), separators=(',', ':'), ensure_ascii=False)}")
+    lines += [
+        f"Change the recipe as follows: {instruction.strip()}",
+        "Keep everything the change does not affect as it is, and keep quantities numeric.",
+        'Respond with JSON only: the full updated recipe as {"recipes":[<one recipe>]}.',
+    ]
+    text = "\n".join(lines)
+    listed = len(recipe.ingredients) if recipe is not None else 0
+    return CompiledPrompt(text, estimate_tokens(text), output_budget(1), listed, 0)
@@ -0,0 +1,111 @@
+"""On-disk response cache for generated recipes.
+
+Entries are keyed by ``preferences.request_key`` and stored in SQLite so
+they survive Streamlit reruns and process restarts. Old entries expire
+after ``ttl_seconds`` and the least recently used ones are evicted once
+the cache holds more than ``max_entries``.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_DIR = os.environ.get("RECIPE_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache"))
+DEFAULT_PATH = os.path.join(CACHE_DIR, "recipes.sqlite3")
+
+
+class RecipeCache:
+    def __init__(self, path=DEFAULT_PATH, ttl_seconds=7 * 24 * 3600, max_entries=1000):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                request TEXT NOT NULL,
+                response TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    def get(self, key, count=True):
+        """Return the cached response for ``key`` or None.
+
+        ``count=False`` leaves the hit/miss counters alone, for lookups made
+        on behalf of another cache.
+        """
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                if count:
+                    self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            if count:
+                self.hits += 1
+            return row[0]
+
+    def set(self, key, request, response):
+        """Store ``response`` for ``key`` and evict expired/overflowing entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, request, response, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps(request, ensure_ascii=False), response, now, now),
+            )
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                """
+                DELETE FROM responses WHERE key IN (
+                    SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?
+                )
+                """,
+                (self.max_entries,),
+            )
+            self._conn.commit()
+
+    def entries(self):
+        """``(request, response)`` pairs for every unexpired entry, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request, response FROM responses WHERE created >= ? ORDER BY created",
+                (time.time() - self.ttl_seconds,),
+            ).fetchall()
+        return [(json.loads(request), response) for request, response in rows]
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def stats(self):
+        """Hit/miss counters for this process plus the current entry count."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self),
+        }
@@ -0,0 +1,211 @@
+"""Persistent history of every generation, searchable with SQLite FTS5.
+
+``RecipeCache`` only keeps recent responses to answer repeat requests;
+``RecipeHistory`` keeps everything: each generation's request, models,
+timing and token counts, and one row per recipe. Recipes are indexed in an
+FTS5 table by name, ingredients, cuisine, meal and dietary flags, and
+pages are fetched by rowid (keyset pagination), so a search touches only
+the index and the rows it returns even with hundreds of thousands of
+recipes stored. Where FTS5 is not compiled in, search falls back to LIKE
+scans.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import NamedTuple
+
+from preferences import request_key
+from recipe_cache import CACHE_DIR
+from recipe_model import Recipe
+
+DEFAULT_PATH = os.path.join(CACHE_DIR, "history.sqlite3")
+TOKEN = re.compile(r"\w+")
+
+
+class HistoryEntry(NamedTuple):
+    id: int
+    created: float
+    source: str
+    model: str
+    cuisine: str
+    meal: str
+    dietary: str
+    recipe: Recipe
+
+
+def _phrase(value):
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _match_expression(query, cuisine, meal, dietary):
+    """FTS5 query: every word of ``query`` as a prefix on name/ingredients, filters on their own columns."""
+    clauses = [f"{{name ingredients}} : {_phrase(word)}*" for word in TOKEN.findall(query.lower())]
+    if cuisine and cuisine != "Any":
+        clauses.append(f"cuisine : {_phrase(cuisine)}")
+    if meal and meal != "Any":
+        clauses.append(f"meal : {_phrase(meal)}")
+    clauses += [f"dietary : {_phrase(flag)}" for flag in dietary]
+    return " AND ".join(clauses)
+
+
+class RecipeHistory:
+    def __init__(self, path=DEFAULT_PATH):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS generations (
+                id INTEGER PRIMARY KEY,
+                created REAL NOT NULL,
+                request_key TEXT,
+                request TEXT NOT NULL,
+                source TEXT NOT NULL,
+                model TEXT,
+                seconds REAL,
+                prompt_tokens INTEGER,
+                output_tokens INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS generations_key ON generations (request_key);
+            CREATE TABLE IF NOT EXISTS recipes (
+                id INTEGER PRIMARY KEY,
+                generation_id INTEGER NOT NULL REFERENCES generations (id),
+                name TEXT NOT NULL,
+                ingredients TEXT NOT NULL,
+                cuisine TEXT NOT NULL,
+                meal TEXT NOT NULL,
+                dietary TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS recipes_generation ON recipes (generation_id);
+            """
+        )
+        try:
+            # External-content index: the text lives once, in ``recipes``
+            self._conn.execute(
+                """
+                CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5 (
+                    name, ingredients, cuisine, meal, dietary, content='recipes', content_rowid='id'
+                )
+                """
+            )
+            self.fts = True
+        except sqlite3.OperationalError:
+            self.fts = False
+        self._conn.commit()
+
+    def record(self, request, recipes, source, model="", seconds=None, usage=None):
+        """Store one generation and its recipes; returns the generation id.
+
+        ``usage`` is ``{model: {"prompt": n, "output": n}}`` as collected in
+        the generation trace; counts are summed across models.
+        """
+        usage = usage or {}
+        request = request or {}
+        dietary = " | ".join(request.get("dietary", []))
+        with self._lock:
+            cursor = self._conn.execute(
+                """
+                INSERT INTO generations (created, request_key, request, source, model, seconds, prompt_tokens, output_tokens)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    time.time(),
+                    request_key(request) if request else None,
+                    json.dumps(request, ensure_ascii=False),
+                    source,
+                    model,
+                    seconds,
+                    sum(counts["prompt"] for counts in usage.values()),
+                    sum(counts["output"] for counts in usage.values()),
+                ),
+            )
+            generation_id = cursor.lastrowid
+            for recipe in recipes:
+                row = (
+                    recipe.name,
+                    ", ".join(ingredient.name for ingredient in recipe.ingredients),
+                    request.get("cuisine", ""),
+                    request.get("meal", ""),
+                    dietary,
+                )
+                cursor = self._conn.execute(
+                    """
+                    INSERT INTO recipes (generation_id, name, ingredients, cuisine, meal, dietary, data)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (generation_id, *row, json.dumps(recipe.to_dict(), ensure_ascii=False)),
+                )
+                if self.fts:
+                    self._conn.execute(
+                        "INSERT INTO recipes_fts (rowid, name, ingredients, cuisine, meal, dietary) VALUES (?, ?, ?, ?, ?, ?)",
+                        (cursor.lastrowid, *row),
+                    )
+            self._conn.commit()
+        return generation_id
+
+    def lookup(self, request, max_age=None):
+        """Recipes of the latest stored generation for exactly this request, or [].
+
+        ``max_age`` (seconds) ignores generations older than that.
+        """
+        oldest = time.time() - max_age if max_age is not None else 0
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT data FROM recipes WHERE generation_id = (
+                    SELECT MAX(id) FROM generations WHERE request_key = ? AND created >= ?
+                ) ORDER BY id
+                """,
+                (request_key(request), oldest),
+            ).fetchall()
+        return [Recipe.from_data(json.loads(data)) for data, in rows]
+
+    def search(self, query="", cuisine="Any", meal="Any", dietary=(), limit=10, before=None):
+        """Newest-first recipes matching ``query`` (ingredient or name words) and the filters.
+
+        Pass the last entry's ``id`` as ``before`` to fetch the next page.
+        """
+        params = []
+        where = []
+        source, order = "recipes r", "r.id"
+        expression = _match_expression(query, cuisine, meal, dietary) if self.fts else ""
+        if expression:
+            # Filter and order on the index's rowid so FTS5 walks matches newest-first and stops at the limit
+            source, order = "recipes_fts f JOIN recipes r ON r.id = f.rowid", "f.rowid"
+            where.append("recipes_fts MATCH ?")
+            params.append(expression)
+        elif not self.fts:
+            for word in TOKEN.findall(query.lower()):
+                where.append("(r.name LIKE ? OR r.ingredients LIKE ?)")
+                params += [f"%{word}%", f"%{word}%"]
+            for column, value in (("cuisine", cuisine), ("meal", meal)):
+                if value and value != "Any":
+                    where.append(f"r.{column} = ?")
+                    params.append(value)
+            for flag in dietary:
+                where.append("r.dietary LIKE ?")
+                params.append(f"%{flag}%")
+        if before is not None:
+            where.append(f"{order} < ?")
+            params.append(before)
+        sql = f"""
+            SELECT r.id, g.created, g.source, g.model, r.cuisine, r.meal, r.dietary, r.data
+            FROM {source} JOIN generations g ON g.id = r.generation_id
+            {"WHERE " + " AND ".join(where) if where else ""}
+            ORDER BY {order} DESC LIMIT ?
+        """
+        with self._lock:
+            rows = self._conn.execute(sql, (*params, limit)).fetchall()
+        return [HistoryEntry(*row[:7], Recipe.from_data(json.loads(row[7]))) for row in rows]
+
+    def recipe_total(self):
+        """Recipes stored so far (the largest rowid, so this stays O(1))."""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(MAX(id), 0) FROM recipes").fetchone()[0]
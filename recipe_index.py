@@ -0,0 +1,196 @@
+"""Offline recipe retrieval over previously generated and saved recipes.
+
+``RecipeIndex`` keeps an inverted index from canonical ingredient terms to
+NumPy arrays of ingredient slots (one per non-staple ingredient of every
+recipe). A query marks the slots any pantry item covers, counts covered
+ingredients per recipe, divides by each recipe's ingredient count and
+masks out recipes that fail the dietary, cuisine and meal filters, so
+top-k matches come back in milliseconds without calling the model.
+
+The corpus is the response cache (whose stored requests carry the sidebar
+preferences each recipe was made for) plus the markdown files written by
+the "💾 Save Recipes" download, dropped into ``LIBRARY_DIR``.
+"""
+
+import glob
+import os
+import threading
+
+import numpy as np
+
+from ingredients import canonical_name
+from preferences import DIETARY_OPTIONS, clean_label
+from recipe_cache import CACHE_DIR
+from recipe_model import parse_recipes, recipes_from_markdown
+
+LIBRARY_DIR = os.environ.get("RECIPE_LIBRARY_DIR", os.path.join(CACHE_DIR, "library"))
+
+# Assumed on hand; they neither count toward a recipe's size nor its matches
+STAPLES = {"salt", "pepper", "black pepper", "water", "oil", "olive oil", "vegetable oil", "sugar"}
+
+# Keywords that rule a recipe out of a diet when its preferences were not recorded
+DIET_EXCLUSIONS = {
+    "Vegetarian": {"chicken", "beef", "pork", "fish", "shrimp", "bacon", "ham", "lamb", "turkey", "salmon",
+                   "tuna", "sausage", "anchovy", "crab", "lobster", "prosciutto", "gelatin"},
+    "Dairy-Free": {"milk", "cheese", "butter", "cream", "yogurt", "ghee", "parmesan", "mozzarella", "feta"},
+    "Gluten-Free": {"flour", "bread", "pasta", "noodle", "couscous", "barley", "breadcrumb", "tortilla",
+                    "soy sauce", "spaghetti", "wheat"},
+    "Nut-Free": {"almond", "peanut", "cashew", "walnut", "pecan", "hazelnut", "pistachio", "nut"},
+}
+DIET_EXCLUSIONS["Vegan"] = DIET_EXCLUSIONS["Vegetarian"] | DIET_EXCLUSIONS["Dairy-Free"] | {"egg", "honey"}
+DIET_BITS = {clean_label(option): 1 << idx for idx, option in enumerate(DIETARY_OPTIONS)}
+UNKNOWN = -1
+
+
+def ingredient_terms(name):
+    """Canonical phrases of up to three words in an ingredient name.
+
+    "boneless chicken breasts" yields "chicken", "breast", "chicken breast",
+    ..., so a pantry entry "chicken" matches it.
+    """
+    words = canonical_name(name).split()
+    terms = set()
+    for size in range(1, min(3, len(words)) + 1):
+        for start in range(len(words) - size + 1):
+            terms.add(canonical_name(" ".join(words[start:start + size])))
+    return terms - {""}
+
+
+def infer_diets(terms):
+    """Bitmask of diets an ingredient term set does not obviously break."""
+    mask = 0
+    for diet, excluded in DIET_EXCLUSIONS.items():
+        if not terms & excluded:
+            mask |= DIET_BITS[diet]
+    return mask
+
+
+class RecipeIndex:
+    def __init__(self):
+        self.recipes = []
+        self._lock = threading.Lock()
+        self._names = set()
+        # term -> ingredient slots; slot -> recipe id
+        self._postings = {}
+        self._slot_recipes = []
+        self._sizes = []
+        self._diets = []
+        self._cuisines = []
+        self._meals = []
+        self._codes = {}
+        self._arrays = None
+
+    def add(self, recipes, request=None):
+        """Index ``recipes``; ``request`` is the canonical request they were generated for, if known.
+
+        Returns how many recipes were new (recipes are de-duplicated by name).
+        """
+        request = request or {}
+        requested_diets = 0
+        for diet in request.get("dietary", ()):
+            requested_diets |= DIET_BITS.get(diet, 0)
+        cuisine = self._code(request.get("cuisine"))
+        meal = self._code(request.get("meal"))
+        added = 0
+        with self._lock:
+            for recipe in recipes:
+                name = recipe.name.casefold()
+                if name in self._names or not recipe.ingredients:
+                    continue
+                self._names.add(name)
+                recipe_id = len(self.recipes)
+                self.recipes.append(recipe)
+                terms = set()
+                size = 0
+                for ingredient in recipe.ingredients:
+                    found = ingredient_terms(ingredient.name)
+                    terms |= found
+                    if canonical_name(ingredient.name) in STAPLES:
+                        continue
+                    # One slot per ingredient, so several matching terms still cover it once
+                    slot = len(self._slot_recipes)
+                    self._slot_recipes.append(recipe_id)
+                    for term in found - STAPLES:
+                        self._postings.setdefault(term, []).append(slot)
+                    size += 1
+                self._sizes.append(max(size, 1))
+                # Diets the recipe was requested for are trusted; the rest are inferred
+                self._diets.append(requested_diets | infer_diets(terms))
+                self._cuisines.append(cuisine)
+                self._meals.append(meal)
+                added += 1
+            if added:
+                self._arrays = None
+        return added
+
+    def add_cache(self, recipe_cache):
+        """Index every response in a ``RecipeCache``."""
+        return sum(self.add(parse_recipes(response), request) for request, response in recipe_cache.entries())
+
+    def add_library(self, directory=LIBRARY_DIR):
+        """Index saved recipe files (``.txt``/``.md`` from the Save Recipes download) in ``directory``."""
+        added = 0
+        for path in sorted(glob.glob(os.path.join(directory, "*.txt")) + glob.glob(os.path.join(directory, "*.md"))):
+            with open(path, encoding="utf-8", errors="replace") as f:
+                added += self.add(recipes_from_markdown(f.read()))
+        return added
+
+    def search(self, pantry, dietary=(), cuisine="Any", meal="Any", k=5, min_score=0.0):
+        """Top ``k`` ``(score, recipe)`` pairs for a pantry of canonical names, best first.
+
+        The score is the share of a recipe's (non-staple) ingredients that the
+        pantry covers. Recipes of unknown cuisine or meal type pass those
+        filters; dietary filters always apply.
+        """
+        postings, slot_recipes, sizes, diets, cuisines, meals = self._snapshot()
+        if not sizes.size:
+            return []
+        covered = np.zeros(slot_recipes.size, dtype=bool)
+        # Pantry names are matched whole; recipes were indexed by their sub-phrases
+        for term in {canonical_name(name) for name in pantry} - STAPLES:
+            slots = postings.get(term)
+            if slots is not None:
+                covered[slots] = True
+        hits = np.bincount(slot_recipes[covered], minlength=sizes.size)
+        scores = hits / sizes
+
+        mask = scores > min_score
+        required = 0
+        for diet in dietary:
+            required |= DIET_BITS.get(diet, 0)
+        if required:
+            mask &= (diets & required) == required
+        for codes, wanted in ((cuisines, cuisine), (meals, meal)):
+            if wanted and wanted != "Any":
+                code = self._codes.get(wanted)
+                mask &= (codes == UNKNOWN) | (codes == code) if code is not None else codes == UNKNOWN
+
+        candidates = np.flatnonzero(mask)
+        if not candidates.size:
+            return []
+        if candidates.size > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [(float(scores[i]), self.recipes[i]) for i in candidates]
+
+    def __len__(self):
+        return len(self.recipes)
+
+    def _code(self, label):
+        if not label or label == "Any":
+            return UNKNOWN
+        return self._codes.setdefault(label, len(self._codes))
+
+    def _snapshot(self):
+        # Posting lists grow as Python lists; searches use frozen NumPy copies rebuilt after adds
+        with self._lock:
+            if self._arrays is None:
+                self._arrays = (
+                    {term: np.array(slots, dtype=np.int32) for term, slots in self._postings.items()},
+                    np.array(self._slot_recipes, dtype=np.int32),
+                    np.array(self._sizes, dtype=np.float32),
+                    np.array(self._diets, dtype=np.int64),
+                    np.array(self._cuisines, dtype=np.int32),
+                    np.array(self._meals, dtype=np.int32),
+                )
+            return self._arrays
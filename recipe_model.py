@@ -0,0 +1,407 @@
+"""Typed recipe model and a tolerant parser for JSON model output.
+
+Generation asks Gemini for JSON shaped like ``SCHEMA_HINT``. The parser
+accepts the text in arbitrary chunks, emits every recipe as soon as its
+object closes and repairs a truncated trailing recipe (open strings,
+brackets and dangling keys) so partial output can still be rendered.
+"""
+
+import hashlib
+import json
+import re
+from dataclasses import dataclass, field
+from fractions import Fraction
+
+SCHEMA_HINT = """{
+  "recipes": [
+    {
+      "name": "string",
+      "description": "string",
+      "prep_time": "string",
+      "cook_time": "string",
+      "servings": 4,
+      "ingredients": [{"name": "string", "quantity": 1.5, "unit": "string"}],
+      "steps": ["string"],
+      "tips": ["string"],
+      "nutrition": {"calories": 450, "protein_g": 30, "carbs_g": 40, "fat_g": 15, "highlights": "string"}
+    }
+  ]
+}"""
+
+
+@dataclass(slots=True)
+class Ingredient:
+    name: str
+    quantity: float | None = None
+    unit: str = ""
+
+    @classmethod
+    def from_data(cls, data):
+        if isinstance(data, str):
+            return cls(name=data.strip())
+        if not isinstance(data, dict):
+            return cls(name=str(data))
+        unit = _text(data.get("unit"))
+        quantity = _number(data.get("quantity"))
+        if quantity is None and isinstance(data.get("quantity"), str):
+            # Keep free-form amounts such as "a pinch" instead of dropping them
+            unit = " ".join(part for part in (data["quantity"].strip(), unit) if part)
+        return cls(name=_text(data.get("name")), quantity=quantity, unit=unit)
+
+    def to_text(self):
+        amount = " ".join(part for part in (_format_quantity(self.quantity), self.unit) if part)
+        return f"{amount} {self.name}".strip()
+
+
+@dataclass(slots=True)
+class Step:
+    number: int
+    text: str
+
+
+@dataclass(slots=True)
+class Nutrition:
+    calories: float | None = None
+    protein_g: float | None = None
+    carbs_g: float | None = None
+    fat_g: float | None = None
+    highlights: str = ""
+
+    @classmethod
+    def from_data(cls, data):
+        if isinstance(data, str):
+            return cls(highlights=data.strip())
+        if not isinstance(data, dict):
+            return cls()
+        return cls(
+            calories=_number(data.get("calories")),
+            protein_g=_number(data.get("protein_g")),
+            carbs_g=_number(data.get("carbs_g")),
+            fat_g=_number(data.get("fat_g")),
+            highlights=_text(data.get("highlights")),
+        )
+
+
+@dataclass(slots=True)
+class Recipe:
+    name: str
+    description: str = ""
+    prep_time: str = ""
+    cook_time: str = ""
+    servings: int | None = None
+    ingredients: list[Ingredient] = field(default_factory=list)
+    steps: list[Step] = field(default_factory=list)
+    tips: list[str] = field(default_factory=list)
+    nutrition: Nutrition = field(default_factory=Nutrition)
+
+    @classmethod
+    def from_data(cls, data):
+        steps = [_text(s.get("text") if isinstance(s, dict) else s) for s in _list(data.get("steps"))]
+        servings = _number(data.get("servings"))
+        return cls(
+            name=_text(data.get("name")) or "Untitled Recipe",
+            description=_text(data.get("description")),
+            prep_time=_text(data.get("prep_time")),
+            cook_time=_text(data.get("cook_time")),
+            servings=int(servings) if servings else None,
+            ingredients=[i for i in map(Ingredient.from_data, _list(data.get("ingredients"))) if i.name],
+            steps=[Step(number=idx, text=text) for idx, text in enumerate(steps, 1) if text],
+            tips=[_text(t) for t in _list(data.get("tips")) if _text(t)],
+            nutrition=Nutrition.from_data(data.get("nutrition")),
+        )
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "description": self.description,
+            "prep_time": self.prep_time,
+            "cook_time": self.cook_time,
+            "servings": self.servings,
+            "ingredients": [{"name": i.name, "quantity": i.quantity, "unit": i.unit} for i in self.ingredients],
+            "steps": [s.text for s in self.steps],
+            "tips": list(self.tips),
+            "nutrition": {
+                "calories": self.nutrition.calories,
+                "protein_g": self.nutrition.protein_g,
+                "carbs_g": self.nutrition.carbs_g,
+                "fat_g": self.nutrition.fat_g,
+                "highlights": self.nutrition.highlights,
+            },
+        }
+
+    def to_markdown(self):
+        lines = [f"## {self.name}"]
+        if self.description:
+            lines += ["", f"*{self.description}*"]
+        facts = []
+        if self.prep_time:
+            facts.append(f"**⏱️ Prep:** {self.prep_time}")
+        if self.cook_time:
+            facts.append(f"**🔥 Cook:** {self.cook_time}")
+        if self.servings:
+            facts.append(f"**🍽️ Servings:** {self.servings}")
+        if facts:
+            lines += ["", " · ".join(facts)]
+        if self.ingredients:
+            lines += ["", "### 🛒 Ingredients"] + [f"- {i.to_text()}" for i in self.ingredients]
+        if self.steps:
+            lines += ["", "### 👩‍🍳 Instructions"] + [f"{s.number}. {s.text}" for s in self.steps]
+        if self.tips:
+            lines += ["", "### 💡 Chef's Tips"] + [f"- {t}" for t in self.tips]
+        n = self.nutrition
+        macros = [
+            f"{label}: {_format_quantity(value)}{suffix}"
+            for label, value, suffix in (
+                ("Calories", n.calories, ""),
+                ("Protein", n.protein_g, "g"),
+                ("Carbs", n.carbs_g, "g"),
+                ("Fat", n.fat_g, "g"),
+            )
+            if value is not None
+        ]
+        if macros or n.highlights:
+            lines += ["", "### 🥗 Nutrition"]
+            if macros:
+                lines.append(" | ".join(macros))
+            if n.highlights:
+                lines += ["", n.highlights]
+        return "\n".join(lines)
+
+
+def recipes_to_json(recipes):
+    return json.dumps({"recipes": [r.to_dict() for r in recipes]}, ensure_ascii=False)
+
+
+def recipe_key(recipe):
+    """Content hash of one recipe, for per-recipe state that must follow edits."""
+    payload = json.dumps(recipe.to_dict(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def recipes_to_markdown(recipes):
+    return "\n\n---\n\n".join(r.to_markdown() for r in recipes)
+
+
+MARKDOWN_FACT = re.compile(r"\*\*[^*]*?(Prep|Cook|Servings):\*\*\s*([^·]+)")
+MARKDOWN_AMOUNT = re.compile(r"^(\d+(?:\.\d+)?(?:\s+\d+/\d+)?|\d+/\d+)\s+(.*)$")
+
+
+def recipes_from_markdown(text):
+    """Parse text written by ``recipes_to_markdown`` (the "Save Recipes" download) back into recipes.
+
+    Amounts come back as a quantity plus the rest of the line as the name,
+    since the unit cannot be told apart from the name reliably.
+    """
+    recipes = []
+    for block in re.split(r"\n---\n", text):
+        data = {"ingredients": [], "steps": [], "tips": []}
+        section = None
+        highlights = []
+        macros = {}
+        for line in block.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("### "):
+                heading = line.casefold()
+                section = next((s for s in ("ingredients", "instructions", "tips", "nutrition") if s in heading), None)
+            elif line.startswith("## "):
+                data["name"] = line[3:].strip()
+                section = None
+            elif section is None and line.startswith("*") and not line.startswith("**"):
+                data["description"] = line.strip("*").strip()
+            elif section is None and line.startswith("**"):
+                for label, value in MARKDOWN_FACT.findall(line):
+                    key = {"Prep": "prep_time", "Cook": "cook_time", "Servings": "servings"}[label]
+                    data[key] = value.strip()
+            elif section == "ingredients" and line.startswith("- "):
+                entry = line[2:].strip()
+                match = MARKDOWN_AMOUNT.match(entry)
+                if match:
+                    data["ingredients"].append({"name": match.group(2), "quantity": match.group(1)})
+                else:
+                    data["ingredients"].append({"name": entry})
+            elif section == "instructions":
+                data["steps"].append(re.sub(r"^\d+\.\s*", "", line))
+            elif section == "tips" and line.startswith("- "):
+                data["tips"].append(line[2:].strip())
+            elif section == "nutrition":
+                pairs = re.findall(r"(Calories|Protein|Carbs|Fat):\s*([\d./ ]+)", line)
+                if pairs:
+                    macros.update(pairs)
+                else:
+                    highlights.append(line)
+        if "name" not in data:
+            continue
+        data["nutrition"] = {
+            "calories": macros.get("Calories"),
+            "protein_g": macros.get("Protein"),
+            "carbs_g": macros.get("Carbs"),
+            "fat_g": macros.get("Fat"),
+            "highlights": " ".join(highlights),
+        }
+        recipes.append(Recipe.from_data(data))
+    return recipes
+
+
+def _text(value):
+    return value.strip() if isinstance(value, str) else ("" if value is None else str(value))
+
+
+def _list(value):
+    return value if isinstance(value, list) else []
+
+
+def _number(value):
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not isinstance(value, str):
+        return None
+    # Accept "2", "2.5", "1/2" and "1 1/2"
+    try:
+        return float(sum(Fraction(part) for part in value.split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def _format_quantity(value):
+    if value is None:
+        return ""
+    whole = int(value)
+    rest = Fraction(value - whole).limit_denominator(8)
+    if rest == 0:
+        return str(whole)
+    if rest == 1:
+        return str(whole + 1)
+    return f"{whole} {rest}" if whole else str(rest)
+
+
+def repair_json(text):
+    """Close a truncated JSON document, dropping a dangling key or partial literal."""
+    stack = []
+    in_string = False
+    escape = False
+    safe_end, safe_stack = 0, []
+    for idx, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+            continue
+        if ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append(ch)
+            safe_end, safe_stack = idx + 1, list(stack)
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            safe_end, safe_stack = idx + 1, list(stack)
+        elif ch == ",":
+            safe_end, safe_stack = idx, list(stack)
+
+    candidates = []
+    tail = text[:-1] if escape else text
+    candidates.append(tail + ('"' if in_string else "") + _closers(stack))
+    candidates.append(text[:safe_end] + _closers(safe_stack))
+    for candidate in candidates:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+# The recipes array is either the whole document or the value of a top-level "recipes" key
+RECIPES_KEY = re.compile(r'"recipes"\s*:\s*$')
+
+
+def _closers(stack):
+    return "".join("}" if ch == "{" else "]" for ch in reversed(stack))
+
+
+class RecipeStreamParser:
+    """Incrementally parse ``{"recipes": [...]}`` (or a bare list) from streamed chunks."""
+
+    def __init__(self):
+        self.recipes = []
+        self._text = ""
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._array_depth = None
+        self._recipe_start = None
+
+    def feed(self, chunk):
+        """Consume ``chunk`` and return the recipes parsed so far, including a partial trailing one."""
+        offset = len(self._text)
+        self._text += chunk
+        for idx in range(offset, len(self._text)):
+            self._scan(idx, self._text[idx])
+        return self.snapshot()
+
+    def _scan(self, idx, ch):
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif ch == "\\":
+                self._escape = True
+            elif ch == '"':
+                self._in_string = False
+            return
+        if ch == '"' and self._stack:
+            self._in_string = True
+        elif ch in "{[":
+            if ch == "{" and self._array_depth is not None and len(self._stack) == self._array_depth:
+                self._recipe_start = idx
+            if ch == "[" and self._array_depth is None and self._is_recipes_array(idx):
+                self._array_depth = len(self._stack) + 1
+            self._stack.append(ch)
+        elif ch in "}]" and self._stack:
+            self._stack.pop()
+            if ch == "}" and self._recipe_start is not None and len(self._stack) == self._array_depth:
+                try:
+                    self.recipes.append(Recipe.from_data(json.loads(self._text[self._recipe_start:idx + 1])))
+                except ValueError:
+                    pass
+                self._recipe_start = None
+
+    def _is_recipes_array(self, idx):
+        if not self._stack:
+            return True
+        return len(self._stack) == 1 and RECIPES_KEY.search(self._text[max(0, idx - 64):idx]) is not None
+
+    def _partial(self):
+        if self._recipe_start is not None:
+            data = repair_json(self._text[self._recipe_start:])
+            if isinstance(data, dict):
+                return Recipe.from_data(data)
+        return None
+
+    def snapshot(self):
+        partial = self._partial()
+        return self.recipes + [partial] if partial else list(self.recipes)
+
+    def finish(self):
+        """Return every recipe, repairing truncated output and accepting a lone recipe object."""
+        if self._array_depth is None:
+            start = self._text.find("{")
+            data = repair_json(self._text[start:]) if start != -1 else None
+            if isinstance(data, dict) and isinstance(data.get("recipes"), list):
+                return [Recipe.from_data(r) for r in data["recipes"] if isinstance(r, dict)]
+            if isinstance(data, dict) and data.get("name"):
+                return [Recipe.from_data(data)]
+            return []
+        return self.snapshot()
+
+
+def parse_recipes(text):
+    """Parse model output into recipes, tolerating code fences and truncation."""
+    parser = RecipeStreamParser()
+    parser.feed(text)
+    return parser.finish()
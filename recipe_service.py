@@ -0,0 +1,287 @@
+"""Streamlit-free recipe generation shared by the app and the batch CLI.
+
+``RecipeService`` bundles the process-wide pieces a generation needs: the
+model client registry, the rate-limiting gateway, the fallback policy and
+the caches. It works on canonical requests (``preferences.canonical_request``),
+so the Streamlit app and ``batch.py`` produce the same prompts, hit the
+same cache entries and warm the same caches. ``refine`` patches a single
+recipe through a chat session rather than regenerating the whole set.
+"""
+
+import json
+import time
+
+from fallback_policy import Cancelled
+from generation import generate_parallel, generate_text
+from preferences import MODEL_OPTIONS, request_key
+from prompts import DEFAULT_INPUT_BUDGET, compile_prompt, compile_refinement, estimate_tokens, variation_hint
+from recipe_model import RecipeStreamParser, parse_recipes, recipes_to_json
+
+# Sampling settings for every call; max_output_tokens comes from the compiled prompt
+GENERATION_CONFIG = {
+    "temperature": 0.7,
+    "top_p": 0.9,
+    "response_mime_type": "application/json",
+}
+
+
+def compile_request(request, parallel=False, budget=DEFAULT_INPUT_BUDGET):
+    """Compiled prompts for a canonical request: one, or one per recipe when ``parallel``."""
+    recipe_count = request["recipe_count"]
+    preferences = (request["time"], request["difficulty"], request["dietary"], request["cuisine"], request["meal"])
+    if parallel and recipe_count > 1:
+        return [
+            compile_prompt(request["ingredients"], 1, *preferences, hint=variation_hint(idx, recipe_count), budget=budget)
+            for idx in range(recipe_count)
+        ]
+    return [compile_prompt(request["ingredients"], recipe_count, *preferences, budget=budget)]
+
+
+class RecipeService:
+    def __init__(self, registry, gateway, policy, recipe_cache, semantic_cache=None, library=None, metrics=None,
+                 models=None, history=None, history_max_age=30 * 24 * 3600):
+        self.registry = registry
+        self.gateway = gateway
+        self.policy = policy
+        self.recipe_cache = recipe_cache
+        self.semantic_cache = semantic_cache
+        self.library = library
+        self.metrics = metrics
+        self.models = list(models or MODEL_OPTIONS.values())
+        self.history = history
+        self.history_max_age = history_max_age
+
+    def cached(self, request, use_history=False):
+        """``(source, recipes, similarity)`` from the caches (and the history if asked); source is None on a miss.
+
+        History answers are opt-in and no older than ``history_max_age``:
+        otherwise a pantry once generated would get the same recipes forever.
+        """
+        recipes = self._cached_recipes(request_key(request))
+        if recipes:
+            return "cache", recipes, 1.0
+        if self.semantic_cache is not None:
+            # Rows whose response has left the cache are skipped (and pruned), not counted as hits.
+            # The semantic cache keeps its own counters, so these reads don't touch the exact cache's
+            _, recipes, similarity = self.semantic_cache.lookup(
+                request, resolve=lambda key: self._cached_recipes(key, count=False)
+            )
+            if recipes:
+                return "similar", recipes, similarity
+        # The history outlives cache expiry and eviction
+        if use_history and self.history is not None:
+            recipes = self.history.lookup(request, max_age=self.history_max_age)
+        if recipes:
+            return "history", recipes, 1.0
+        return None, [], 0.0
+
+    def _cached_recipes(self, key, count=True):
+        cached = self.recipe_cache.get(key, count=count)
+        return parse_recipes(cached) if cached else []
+
+    def library_matches(self, request, k=None):
+        """Top ``(score, recipe)`` matches for the request's pantry in the local recipe library."""
+        if self.library is None:
+            return []
+        return self.library.search(
+            request["ingredients"], request["dietary"], request["cuisine"], request["meal"],
+            k=k or request["recipe_count"],
+        )
+
+    def _usage_recorder(self, trace):
+        # Token usage reported by the API, per model (hedged attempts bill both models)
+        usage_totals = trace["usage"] = {}
+        metrics = self.metrics
+
+        def record_usage(model_name, usage):
+            counts = {
+                "prompt": getattr(usage, "prompt_token_count", 0) or 0,
+                "output": getattr(usage, "candidates_token_count", 0) or 0,
+            }
+            totals = usage_totals.setdefault(model_name, {"prompt": 0, "output": 0})
+            for kind, count in counts.items():
+                totals[kind] += count
+                if metrics:
+                    metrics.inc("recipe_tokens_total", count, help="Tokens reported in usage_metadata",
+                                model=model_name, kind=kind)
+
+        return record_usage
+
+    def generate(self, request, compiled, stream=False, on_partial=None, on_progress=None, trace=None):
+        """Call the model for ``request`` (selected model first, then fallbacks) and cache the result.
+
+        ``compiled`` comes from ``compile_request``; more than one prompt
+        means one call per recipe. ``on_partial(recipes)`` receives recipes
+        parsed so far (``None`` when output restarts on another model; with
+        one call per recipe, finished recipes are kept and only the missing
+        ones are asked of the next model) and ``on_progress(done, total)``
+        counts finished per-recipe calls.
+        Returns ``(used_model, recipes)``; exceptions from the last
+        candidate model propagate.
+        """
+        trace = trace if trace is not None else {}
+        metrics = self.metrics
+        selected_model = request["model"]
+        recipe_count = request["recipe_count"]
+        generation_config = dict(GENERATION_CONFIG, max_output_tokens=compiled[0].max_output_tokens)
+        models = [selected_model] + [m for m in self.models if m != selected_model]
+        clients = {model_name: self.registry.borrow(model_name, generation_config) for model_name in models}
+        registry, gateway = self.registry, self.gateway
+        on_partial = on_partial or (lambda recipes: None)
+        on_progress = on_progress or (lambda done, total: None)
+
+        record_usage = self._usage_recorder(trace)
+
+        if len(compiled) > 1:
+            # One request per recipe, each recipe reported as it finishes
+            prompts = [one.text for one in compiled]
+            slots = [[] for _ in range(recipe_count)]
+            # Recipes that came back, whichever model made them; a fallback only redoes the others
+            completed = {}
+
+            def attempt(model_name, report):
+                model = clients[model_name]
+
+                def call_model(one_prompt):
+                    with registry.track(model_name, ignore=(Cancelled,)):
+                        return generate_text(
+                            model, one_prompt, generation_config,
+                            on_usage=lambda usage: record_usage(model_name, usage)
+                        )
+
+                def generate(one_prompt):
+                    # A failed recipe must not cancel the others, so errors come back as results
+                    try:
+                        return gateway.call(model_name, one_prompt, generation_config, lambda: call_model(one_prompt))
+                    except Exception as exc:
+                        return exc
+
+                todo = [idx for idx in range(recipe_count) if idx not in completed]
+                errors = []
+                for position, text in generate_parallel(generate, [prompts[idx] for idx in todo]):
+                    idx = todo[position]
+                    recipes = [] if isinstance(text, Exception) else parse_recipes(text)
+                    if not recipes:
+                        errors.append(text if isinstance(text, Exception) else ValueError(f"No recipe in response {idx + 1}"))
+                        continue
+                    report((idx, completed.setdefault(idx, recipes)))
+                if errors:
+                    raise errors[0]
+                return [recipe for idx in range(recipe_count) for recipe in completed[idx]]
+
+            def show_progress(item):
+                idx, recipes = item
+                slots[idx] = recipes
+                on_partial([recipe for batch in slots for recipe in batch])
+                on_progress(sum(1 for batch in slots if batch), recipe_count)
+
+            def reset_progress():
+                # The next model starts from the recipes already done, not from scratch
+                for idx in range(recipe_count):
+                    slots[idx] = completed.get(idx, [])
+                on_partial([recipe for batch in slots for recipe in batch] or None)
+                on_progress(len(completed), recipe_count)
+
+            on_progress(0, recipe_count)
+        else:
+            prompt = compiled[0].text
+            stream_parser = [RecipeStreamParser()]
+
+            def attempt(model_name, report):
+                model = clients[model_name]
+
+                def call_model():
+                    with registry.track(model_name, ignore=(Cancelled,)):
+                        return generate_text(
+                            model,
+                            prompt,
+                            generation_config,
+                            stream=stream,
+                            on_chunk=report,
+                            on_usage=lambda usage: record_usage(model_name, usage)
+                        )
+
+                text = gateway.call(model_name, prompt, generation_config, call_model)
+                return parse_recipes(text)
+
+            def show_progress(piece):
+                on_partial(stream_parser[0].feed(piece))
+
+            def reset_progress():
+                stream_parser[0] = RecipeStreamParser()
+                on_partial(None)
+
+        started = time.perf_counter()
+        # Only a single streamed call reports a first token; the rest are hedged on total time
+        streaming = stream and len(compiled) == 1
+        used_model, recipes = self.policy.execute(models, attempt, show_progress, reset_progress, streaming=streaming)
+        trace["used_model"] = used_model
+        trace["generation_seconds"] = round(time.perf_counter() - started, 4)
+        if used_model != selected_model and metrics:
+            metrics.inc("recipe_fallbacks_total", help="Generations answered by a fallback model",
+                        selected=selected_model, used=used_model)
+
+        if recipes:
+            key = request_key(request)
+            self.recipe_cache.set(key, request, recipes_to_json(recipes))
+            if self.semantic_cache is not None:
+                self.semantic_cache.add(request, key, latency=time.perf_counter() - started)
+            if self.library is not None:
+                self.library.add(recipes, request)
+            if self.history is not None:
+                self.history.record(request, recipes, "model", used_model, trace["generation_seconds"], trace["usage"])
+        return used_model, recipes
+
+    def refine(self, recipe, instruction, model_name, history=None, trace=None):
+        """Change one recipe through a chat session instead of regenerating the whole set.
+
+        ``history`` is the exchange returned by an earlier ``refine`` of this
+        recipe; with it only the instruction is sent, since the model's last
+        reply already holds the recipe. Returns ``(used_model, recipe,
+        history)``, where the new history keeps just the latest exchange so
+        follow-up tweaks stay about one recipe long.
+        """
+        trace = trace if trace is not None else {}
+        history = list(history or [])
+        compiled = compile_refinement(instruction, None if history else recipe)
+        generation_config = dict(GENERATION_CONFIG, max_output_tokens=compiled.max_output_tokens)
+        models = [model_name] + [m for m in self.models if m != model_name]
+        clients = {name: self.registry.borrow(name, generation_config) for name in models}
+        registry, gateway = self.registry, self.gateway
+        record_usage = self._usage_recorder(trace)
+        # The history is sent again with every message, so it is part of what the gateway budgets and coalesces
+        context = json.dumps(history, ensure_ascii=False) + compiled.text
+        trace["input_tokens_estimate"] = estimate_tokens(context)
+        replies = {}
+
+        def attempt(name, report):
+            chat = clients[name].start_chat(history=list(history))
+
+            def call_model():
+                with registry.track(name, ignore=(Cancelled,)):
+                    response = chat.send_message(compiled.text)
+                    usage = getattr(response, "usage_metadata", None)
+                    if usage is not None:
+                        record_usage(name, usage)
+                    return response.text
+
+            replies[name] = gateway.call(name, context, generation_config, call_model)
+            return parse_recipes(replies[name])[:1]
+
+        started = time.perf_counter()
+        used_model, recipes = self.policy.execute(models, attempt, streaming=False)
+        trace["used_model"] = used_model
+        trace["generation_seconds"] = round(time.perf_counter() - started, 4)
+        if not recipes:
+            raise ValueError("The model did not return an updated recipe")
+        if self.metrics:
+            self.metrics.inc("recipe_refinements_total", help="Single-recipe refinements", model=used_model)
+        if self.library is not None:
+            self.library.add(recipes)
+        if self.history is not None:
+            self.history.record(None, recipes, "refine", used_model, trace["generation_seconds"], trace["usage"])
+        history = [
+            {"role": "user", "parts": [compile_refinement(instruction).text]},
+            {"role": "model", "parts": [replies[used_model]]},
+        ]
+        return used_model, recipes[0], history
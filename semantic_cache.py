@@ -0,0 +1,223 @@
+"""Similarity cache for near-duplicate generation requests.
+
+The exact response cache misses "chicken, rice, peppers" when an earlier
+request asked for "chicken breast, basmati rice, bell pepper" with the
+same preferences. ``SemanticCache`` embeds the request's ingredient list as
+hashed word and character-trigram features (weighted toward each
+ingredient's head noun, so "basmati rice" stays close to "rice"), stores
+each unit vector next to its cache key in SQLite and, among earlier
+requests with identical preferences, returns the cache key of the most
+similar one whose answer is still cached, when its cosine similarity
+reaches ``threshold``. Responses themselves stay in ``RecipeCache``; rows
+whose response has expired or been evicted are dropped when a lookup finds
+them gone, and only the newest ``max_entries`` rows are kept.
+
+Several processes (the app, ``batch.py``) can share one cache directory:
+rows are appended by SQLite, and each process loads the rows others added
+into its in-memory matrices before it looks anything up.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+import numpy as np
+
+from preferences import request_key
+from recipe_cache import CACHE_DIR
+
+DIMENSIONS = 512
+DEFAULT_THRESHOLD = 0.9
+# Modifiers ("basmati", "bell") matter far less than the food itself ("rice", "pepper")
+HEAD_WEIGHT = 1.0
+MODIFIER_WEIGHT = 0.25
+TRIGRAM_WEIGHT = 0.2
+# Cuts name a part of the food before them: "chicken breast" is chicken
+CUT_WORDS = {"breast", "thigh", "fillet", "wing", "leg", "drumstick", "loin", "tenderloin", "chop", "steak", "mince"}
+
+
+def _bucket(token):
+    h = zlib.crc32(token.encode("utf-8"))
+    # The top bit picks a sign so colliding features tend to cancel instead of pile up
+    return h % DIMENSIONS, (1.0 if h & 0x80000000 else -1.0)
+
+
+def _ingredient_vector(name):
+    words = name.split()
+    head = len(words) - 1
+    if head > 0 and words[head] in CUT_WORDS:
+        head -= 1
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for position, word in enumerate(words):
+        idx, sign = _bucket("w:" + word)
+        vector[idx] += sign * (HEAD_WEIGHT if position == head else MODIFIER_WEIGHT)
+    # Trigrams of the head word let near-spellings ("chili"/"chilli") overlap
+    padded = f" {words[head]} "
+    for start in range(len(padded) - 2):
+        idx, sign = _bucket("t:" + padded[start:start + 3])
+        vector[idx] += sign * TRIGRAM_WEIGHT
+    return vector / np.linalg.norm(vector)
+
+
+def embed_ingredients(ingredients):
+    """Unit vector for a list of canonical ingredient names; every ingredient weighs the same."""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    for name in ingredients:
+        if name.strip():
+            vector += _ingredient_vector(name)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def preference_key(request):
+    """Key of everything in a canonical request except the ingredients; only equal keys are compared."""
+    return request_key({k: v for k, v in request.items() if k != "ingredients"})
+
+
+class _Group:
+    """In-memory rows of one preference key; ``matrix`` is rebuilt when rows were added."""
+
+    __slots__ = ("ids", "keys", "latencies", "vectors", "matrix")
+
+    def __init__(self):
+        self.ids = []
+        self.keys = []
+        self.latencies = []
+        self.vectors = []
+        self.matrix = None
+
+
+class SemanticCache:
+    def __init__(self, directory=CACHE_DIR, threshold=DEFAULT_THRESHOLD, max_entries=2000):
+        os.makedirs(directory, exist_ok=True)
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.path = os.path.join(directory, "semantic.sqlite3")
+        self.lookups = 0
+        self.hits = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        self._groups = {}
+        self._last_id = 0
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                id INTEGER PRIMARY KEY,
+                pref TEXT NOT NULL,
+                key TEXT NOT NULL,
+                latency REAL NOT NULL,
+                vector BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        # The memmap store used row numbers private to each process; its rows can't be trusted
+        for name in ("semantic.f32", "semantic.jsonl"):
+            if os.path.exists(os.path.join(directory, name)):
+                os.remove(os.path.join(directory, name))
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        # Rows pruned by any process since the last call
+        oldest = self._conn.execute("SELECT MIN(id) FROM vectors").fetchone()[0]
+        self._drop(lambda row_id, key: oldest is None or row_id < oldest)
+        # Rows appended since the last call, by this process or any other
+        rows = self._conn.execute(
+            "SELECT id, pref, key, latency, vector FROM vectors WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row_id, pref, key, latency, vector in rows:
+            group = self._groups.get(pref)
+            if group is None:
+                group = self._groups[pref] = _Group()
+            group.ids.append(row_id)
+            group.keys.append(key)
+            group.latencies.append(latency)
+            group.vectors.append(np.frombuffer(vector, dtype=np.float32))
+            group.matrix = None
+            self._last_id = row_id
+
+    def _drop(self, gone):
+        """Forget in-memory rows for which ``gone(row_id, key)`` is true."""
+        for pref, group in list(self._groups.items()):
+            keep = [idx for idx, (row_id, key) in enumerate(zip(group.ids, group.keys)) if not gone(row_id, key)]
+            if len(keep) == len(group.ids):
+                continue
+            if not keep:
+                del self._groups[pref]
+                continue
+            for name in ("ids", "keys", "latencies", "vectors"):
+                values = getattr(group, name)
+                setattr(group, name, [values[idx] for idx in keep])
+            group.matrix = None
+
+    def lookup(self, request, resolve=None):
+        """``(cache_key, answer, similarity)`` of the closest earlier request whose answer still resolves.
+
+        Rows at or above ``threshold`` are tried best first. ``resolve(key)``
+        returns the cached answer, or something falsy once it is gone; then
+        the row is dropped and the next-best one tried. Without ``resolve``
+        the answer is the key itself. A miss returns ``(None, None, best
+        similarity)``; only a resolved answer counts as a hit.
+        """
+        start = time.perf_counter()
+        query = embed_ingredients(request["ingredients"])
+        pref = preference_key(request)
+        with self._lock:
+            self.lookups += 1
+            self._sync()
+            group = self._groups.get(pref)
+            if group is None:
+                return None, None, 0.0
+            if group.matrix is None:
+                group.matrix = np.vstack(group.vectors)
+            scores = group.matrix @ query
+            order = np.argsort(-scores)
+            candidates = [(group.keys[idx], float(scores[idx]), group.latencies[idx])
+                          for idx in order if scores[idx] >= self.threshold]
+        for key, similarity, latency in candidates:
+            answer = resolve(key) if resolve else key
+            if answer:
+                with self._lock:
+                    self.hits += 1
+                    # What the original generation cost, less the time spent looking it up
+                    self.saved_seconds += max(0.0, latency - (time.perf_counter() - start))
+                return key, answer, similarity
+            self.discard(key)
+        return None, None, float(scores[order[0]])
+
+    def discard(self, key):
+        """Drop every row answered by ``key`` (its response is no longer cached)."""
+        with self._lock:
+            self._conn.execute("DELETE FROM vectors WHERE key = ?", (key,))
+            self._conn.commit()
+            self._drop(lambda row_id, row_key: row_key == key)
+
+    def add(self, request, key, latency=0.0):
+        """Remember that ``key`` answers ``request``; ``latency`` is how long generating it took."""
+        vector = embed_ingredients(request["ingredients"]).astype(np.float32)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO vectors (pref, key, latency, vector) VALUES (?, ?, ?, ?)",
+                (preference_key(request), key, round(latency, 3), vector.tobytes()),
+            )
+            # Keep the newest max_entries rows; older answers have mostly left RecipeCache anyway
+            self._conn.execute(
+                "DELETE FROM vectors WHERE id IN (SELECT id FROM vectors ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._conn.commit()
+            self._sync()
+
+    def stats(self):
+        return {
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "hit_rate": self.hits / self.lookups if self.lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "entries": sum(len(group.ids) for group in self._groups.values()),
+        }
@@ -0,0 +1,280 @@
+"""Per-session recipe state with a size cap, disk offload and idle reaping.
+
+``st.session_state`` lives as long as the browser tab and nothing bounds
+it, so each open tab pins its recipes and refinement chats in the server
+process. ``SessionStore`` holds that state instead; a session keeps only
+its id, much like background jobs. Each session is held to ``max_bytes``
+of serialized state: refinement chats beyond it are written to disk as
+zlib-compressed JSON blobs, oldest first, and read back if the user tweaks
+that recipe again. Sessions idle for ``idle_seconds`` are offloaded whole
+and restored on their next run; sessions idle for ``ttl_seconds`` (closed
+tabs) are dropped along with their blobs.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+import zlib
+
+from recipe_cache import CACHE_DIR
+from recipe_model import Recipe
+
+DEFAULT_DIR = os.path.join(CACHE_DIR, "sessions")
+
+
+def process_rss_bytes():
+    """Resident set size of this process, or None where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _size(value):
+    return len(json.dumps(value, ensure_ascii=False))
+
+
+class BlobStore:
+    """Compressed JSON values on disk, one file per key."""
+
+    def __init__(self, directory=DEFAULT_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json.z")
+
+    def put(self, value):
+        """Store ``value``; returns ``(key, compressed size)``."""
+        data = zlib.compress(json.dumps(value, ensure_ascii=False).encode("utf-8"), 6)
+        key = uuid.uuid4().hex
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        return key, len(data)
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as f:
+                return json.loads(zlib.decompress(f.read()))
+        except (OSError, ValueError, zlib.error):
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def purge(self, older_than):
+        """Remove blobs last written before ``older_than`` (left behind by an earlier process)."""
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".json.z") and entry.stat().st_mtime < older_than:
+                self.delete(entry.name[:-len(".json.z")])
+
+
+class Workspace:
+    """One session's recipes and refinement chats; changed only through its methods."""
+
+    def __init__(self, session_id, store):
+        self.id = session_id
+        self._store = store
+        self._recipes = []
+        # recipe_key -> last chat exchange, or the blob key once offloaded; oldest first
+        self._chats = {}
+        # Whole-session blob while the session is idle
+        self._blob = None
+        self._recipes_bytes = 0
+        self._chat_bytes = {}
+        # Other per-session state reported by the app (e.g. the pantry), for the gauges only
+        self._accounted = {}
+        # Blob key -> compressed size, for everything of this session on disk
+        self._blob_sizes = {}
+        self.last_seen = time.time()
+
+    @property
+    def recipes(self):
+        return list(self._recipes)
+
+    def set_recipes(self, recipes):
+        with self._store._lock:
+            self._recipes = list(recipes)
+            self._recipes_bytes = _size([recipe.to_dict() for recipe in self._recipes])
+            self._enforce()
+
+    def chat(self, key):
+        """Last refinement exchange for the recipe with ``recipe_key`` ``key``, or None."""
+        with self._store._lock:
+            chat = self._chats.get(key)
+            if isinstance(chat, str):
+                return self._store.blobs.get(chat)
+            return chat
+
+    def remember_chat(self, key, history):
+        with self._store._lock:
+            self._drop_chat(key)
+            self._chats[key] = history
+            self._chat_bytes[key] = _size(history)
+            # Only recent recipes get follow-up tweaks; forget the oldest conversations
+            while len(self._chats) > self._store.max_chats:
+                self._drop_chat(next(iter(self._chats)))
+            self._enforce()
+
+    def account(self, name, nbytes):
+        self._accounted[name] = nbytes
+
+    @property
+    def bytes(self):
+        """Serialized size of the state held in memory for this session."""
+        return self._recipes_bytes + sum(self._chat_bytes.values()) + sum(self._accounted.values())
+
+    @property
+    def offloaded_bytes(self):
+        return sum(self._blob_sizes.values())
+
+    @property
+    def offloaded(self):
+        return self._blob is not None
+
+    def _put(self, value):
+        key, size = self._store.blobs.put(value)
+        self._blob_sizes[key] = size
+        return key
+
+    def _delete(self, key):
+        self._blob_sizes.pop(key, None)
+        self._store.blobs.delete(key)
+
+    def _drop_chat(self, key):
+        chat = self._chats.pop(key, None)
+        self._chat_bytes.pop(key, None)
+        if isinstance(chat, str):
+            self._delete(chat)
+
+    def _enforce(self):
+        # Over the cap: compress chats to disk, oldest first; the newest stays for the next tweak
+        for key in list(self._chats)[:-1]:
+            if self.bytes <= self._store.max_bytes:
+                break
+            chat = self._chats[key]
+            if isinstance(chat, str):
+                continue
+            self._chats[key] = self._put(chat)
+            del self._chat_bytes[key]
+
+    def _offload(self):
+        self._blob = self._put({
+            "recipes": [recipe.to_dict() for recipe in self._recipes],
+            "chats": self._chats,
+        })
+        self._recipes, self._chats = [], {}
+        self._recipes_bytes, self._chat_bytes = 0, {}
+
+    def _restore(self):
+        data = self._store.blobs.get(self._blob) or {"recipes": [], "chats": {}}
+        self._delete(self._blob)
+        self._blob = None
+        self._recipes = [Recipe.from_data(item) for item in data["recipes"]]
+        self._recipes_bytes = _size(data["recipes"])
+        self._chats = data["chats"]
+        self._chat_bytes = {key: _size(chat) for key, chat in self._chats.items() if not isinstance(chat, str)}
+
+    def _forget(self):
+        for key in list(self._blob_sizes):
+            self._delete(key)
+
+
+class SessionStore:
+    def __init__(self, directory=DEFAULT_DIR, max_bytes=256 * 1024, max_chats=20, idle_seconds=900,
+                 ttl_seconds=6 * 3600, metrics=None):
+        self.max_bytes = max_bytes
+        self.max_chats = max_chats
+        self.idle_seconds = idle_seconds
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics
+        self.blobs = BlobStore(directory)
+        # Blobs of sessions from an earlier process that were never reaped
+        self.blobs.purge(time.time() - ttl_seconds)
+        self._sessions = {}
+        self._lock = threading.RLock()
+        self._reaper = None
+
+    def get(self, session_id):
+        """The session's workspace, restored from disk if it was offloaded; marks the session active."""
+        with self._lock:
+            workspace = self._sessions.get(session_id)
+            if workspace is None:
+                workspace = self._sessions[session_id] = Workspace(session_id, self)
+            elif workspace.offloaded:
+                workspace._restore()
+            workspace.last_seen = time.time()
+            return workspace
+
+    def reap(self):
+        """Offload idle sessions, drop expired ones and refresh the gauges; returns ``(offloaded, dropped)``."""
+        now = time.time()
+        offloaded = dropped = 0
+        with self._lock:
+            for session_id, workspace in list(self._sessions.items()):
+                idle = now - workspace.last_seen
+                if idle > self.ttl_seconds:
+                    workspace._forget()
+                    del self._sessions[session_id]
+                    dropped += 1
+                elif idle > self.idle_seconds and not workspace.offloaded:
+                    workspace._offload()
+                    offloaded += 1
+        self.publish()
+        return offloaded, dropped
+
+    def start_reaper(self, interval=60):
+        """Run ``reap`` every ``interval`` seconds from a daemon thread."""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.reap()
+                except Exception:
+                    pass
+
+        if self._reaper is None:
+            self._reaper = threading.Thread(target=loop, name="session-reaper", daemon=True)
+            self._reaper.start()
+
+    def stats(self):
+        with self._lock:
+            sessions = [
+                {"id": w.id, "bytes": w.bytes, "offloaded": w.offloaded,
+                 "offloaded_bytes": w.offloaded_bytes, "idle_seconds": time.time() - w.last_seen}
+                for w in self._sessions.values()
+            ]
+        return {
+            "sessions": len(sessions),
+            "offloaded": sum(s["offloaded"] for s in sessions),
+            "bytes": sum(s["bytes"] for s in sessions),
+            "max_session_bytes": max((s["bytes"] for s in sessions), default=0),
+            "offloaded_bytes": sum(s["offloaded_bytes"] for s in sessions),
+            "rss_bytes": process_rss_bytes(),
+            "per_session": sorted(sessions, key=lambda s: s["bytes"], reverse=True),
+        }
+
+    def publish(self):
+        """Copy the memory gauges into ``metrics``."""
+        if self.metrics is None:
+            return
+        stats = self.stats()
+        metrics = self.metrics
+        # Per-session series are rebuilt each time so reaped sessions disappear
+        metrics.clear("session_state_bytes")
+        for session in stats["per_session"]:
+            metrics.set("session_state_bytes", session["bytes"], help="Serialized state held in memory per session",
+                        session=session["id"][:12])
+        metrics.set("session_state_bytes_total", stats["bytes"], help="Serialized session state held in memory")
+        metrics.set("sessions", stats["sessions"] - stats["offloaded"], help="Tracked sessions", state="resident")
+        metrics.set("sessions", stats["offloaded"], help="Tracked sessions", state="offloaded")
+        if stats["rss_bytes"] is not None:
+            metrics.set("process_resident_memory_bytes", stats["rss_bytes"], help="Resident set size of the server")
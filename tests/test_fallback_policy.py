@@ -0,0 +1,45 @@
+import threading
+import time
+
+import pytest
+
+from fallback_policy import FallbackPolicy
+
+
+def test_winner_failure_hands_over_to_finished_hedge():
+    # A streams first, hedge B then finishes while A is still the winner, and A fails afterwards
+    policy = FallbackPolicy(hedge_deadline=0.05)
+    a_reported = threading.Event()
+    b_finished = threading.Event()
+    progress, resets = [], []
+
+    def attempt(model, report):
+        if model == "A":
+            # Still silent when the hedge deadline passes, so B gets launched
+            time.sleep(0.2)
+            report("a")
+            a_reported.set()
+            assert b_finished.wait(5)
+            time.sleep(0.1)
+            raise RuntimeError("A died")
+        assert a_reported.wait(5)
+        report("b")
+        b_finished.set()
+        return "B-result"
+
+    result = policy.execute(["A", "B"], attempt, on_progress=progress.append, on_reset=lambda: resets.append(1))
+
+    assert result == ("B", "B-result")
+    assert resets == [1]
+    # A's output is shown, reset, then replaced by B's buffered output
+    assert progress == ["a", "b"]
+
+
+def test_raises_when_every_model_fails():
+    policy = FallbackPolicy(hedge_deadline=0.05, max_retries=0)
+
+    def attempt(model, report):
+        raise RuntimeError(f"{model} died")
+
+    with pytest.raises(RuntimeError):
+        policy.execute(["A", "B"], attempt)
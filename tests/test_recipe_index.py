@@ -0,0 +1,26 @@
+from recipe_index import RecipeIndex
+from recipe_model import Recipe
+
+
+def stir_fry():
+    return Recipe.from_data({
+        "name": "Chicken Stir Fry",
+        "ingredients": ["chicken breast", "soy sauce", "broccoli", "garlic", "salt"],
+    })
+
+
+def test_score_counts_each_recipe_ingredient_once():
+    index = RecipeIndex()
+    index.add([stir_fry()])
+    # Three pantry terms all hit "chicken breast"; only it and soy sauce are covered
+    [(score, recipe)] = index.search(["chicken", "chicken breast", "breast", "soy"])
+    assert recipe.name == "Chicken Stir Fry"
+    assert score == 0.5
+
+
+def test_staples_do_not_count():
+    index = RecipeIndex()
+    index.add([stir_fry()])
+    [(score, _)] = index.search(["chicken breast", "soy sauce", "broccoli", "garlic"])
+    assert score == 1.0
+    assert index.search(["salt"]) == []
@@ -0,0 +1,29 @@
+import json
+import os
+
+from preferences import canonical_request, request_key
+from recipe_cache import RecipeCache
+from recipe_service import RecipeService
+from semantic_cache import SemanticCache
+
+
+def request(*ingredients):
+    return canonical_request(list(ingredients), "30-45 min", "Easy", [], "Any", "Any", "gemini-1.5-flash", 1)
+
+
+def test_similar_hit_leaves_exact_cache_counters_alone(tmp_path):
+    recipe_cache = RecipeCache(path=os.path.join(tmp_path, "responses.sqlite3"))
+    semantic_cache = SemanticCache(directory=str(tmp_path), threshold=0.5)
+    service = RecipeService(None, None, None, recipe_cache, semantic_cache=semantic_cache)
+    earlier = request("chicken", "rice", "garlic", "onion")
+    response = {"recipes": [{"name": "Garlic Rice", "ingredients": ["rice"], "steps": ["Cook"]}]}
+    recipe_cache.set(request_key(earlier), earlier, json.dumps(response))
+    semantic_cache.add(earlier, request_key(earlier))
+
+    source, recipes, _ = service.cached(request("chicken", "rice", "garlic", "onion", "pea"))
+
+    assert source == "similar"
+    assert [recipe.name for recipe in recipes] == ["Garlic Rice"]
+    # Only the exact lookup of the new request counts, as a miss
+    assert (recipe_cache.stats()["hits"], recipe_cache.stats()["misses"]) == (0, 1)
+    assert semantic_cache.stats()["hits"] == 1